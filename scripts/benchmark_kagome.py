@@ -0,0 +1,147 @@
+from __future__ import print_function
+
+import argparse
+import json
+import math
+import time
+import tracemalloc
+
+from compas.datastructures import Mesh
+
+from compas_kagome.kagome import Kagome
+from compas_kagome.colouring import kagome_polyedge_colouring
+from compas_kagome.colouring import kagome_polyedge_structured_colouring
+from compas_kagome.skeleton import trimesh_skeleton
+
+
+def lattice_lines(n, layers=2, spacing=2.):
+	# periodic lattice with diagonals, n x n x layers nodes
+	points = {}
+	for x in range(n):
+		for y in range(n):
+			for z in range(layers):
+				points[x, y, z] = [spacing * x, spacing * y, spacing * z]
+	lines = []
+	for (x, y, z), point in points.items():
+		for dx, dy, dz in [(1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 1)]:
+			other = points.get((x + dx, y + dy, z + dz))
+			if other is not None:
+				lines.append([point, other])
+	return lines
+
+
+def node_lines():
+	# two five-valent nodes
+	a, b = [0., 0., 0.], [0., 0., 1.]
+	ends_a = [[1., 0., -1.], [-1., 0., -1.], [0., 1., -1.], [0., -1., -1.]]
+	ends_b = [[1., 0., 2.], [-1., 0., 2.], [0., 1., 2.], [0., -1., 2.]]
+	return [[a, b]] + [[a, c] for c in ends_a] + [[b, c] for c in ends_b]
+
+
+def coarse_meshes():
+	skeleton = Mesh.from_vertices_and_faces(*trimesh_skeleton(Mesh, node_lines(), radius=.3).to_vertices_and_faces())
+	skeleton.remove_unused_vertices()
+	return {
+		'patch': Mesh.from_vertices_and_faces(
+			[[0., 0., 0.], [1., 0., 0.], [1., 1., 0.], [0., 1., 0.], [0.5, 0.5, 0.]],
+			[[0, 1, 4], [1, 2, 4], [2, 3, 4], [3, 0, 4]]),
+		'icosahedron': Mesh.from_polyhedron(20),
+		'skeleton': skeleton,
+	}
+
+
+def measure(func, args=(), memory=True):
+	# wall time of a first call, peak traced memory of a second call
+	t0 = time.time()
+	result = func(*args)
+	seconds = time.time() - t0
+	peak = None
+	if memory:
+		tracemalloc.start()
+		func(*args)
+		peak = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+	return result, seconds, peak
+
+
+def scaling_exponent(sizes, seconds):
+	# slope of the least-squares line through log(time) against log(size)
+	points = [(math.log(size), math.log(t)) for size, t in zip(sizes, seconds) if size > 0 and t > 0]
+	if len(points) < 2:
+		return None
+	mx = sum(x for x, y in points) / len(points)
+	my = sum(y for x, y in points) / len(points)
+	sxx = sum((x - mx) ** 2 for x, y in points)
+	if sxx == 0:
+		return None
+	return sum((x - mx) * (y - my) for x, y in points) / sxx
+
+
+def run(kmax, lattice_max, max_faces, memory):
+
+	records = []
+
+	def record(stage, mesh, k, size, seconds, peak):
+		records.append({'stage': stage, 'mesh': mesh, 'k': k, 'size': size, 'seconds': seconds, 'peak': peak})
+		print('{:<18} {:<12} {:>2} {:>9} {:>10.4f} {:>10}'.format(stage, mesh, k, size, seconds, '-' if peak is None else '{:.1f}'.format(peak / 1e6)))
+
+	print('{:<18} {:<12} {:>2} {:>9} {:>10} {:>10}'.format('stage', 'mesh', 'k', 'size', 'seconds', 'peak MB'))
+
+	for name, coarse_mesh in coarse_meshes().items():
+		for k in range(1, kmax + 1):
+			if coarse_mesh.number_of_faces() * 4 ** k > max_faces:
+				break
+			kagome, seconds, peak = measure(Kagome.from_mesh, (coarse_mesh, k), memory)
+			record('from_mesh', name, k, kagome.number_of_faces(), seconds, peak)
+			_, seconds, peak = measure(Kagome.from_mesh_numpy, (coarse_mesh, k), memory)
+			record('from_mesh_numpy', name, k, kagome.number_of_faces(), seconds, peak)
+			polyedges, seconds, peak = measure(kagome.store_polyedge_data, (), memory)
+			size = kagome.number_of_edges()
+			record('polyedges', name, k, size, seconds, peak)
+			for stage, func in [
+				('polyline_frames', kagome.polyline_frames),
+				('polyline_frames_np', kagome.polyline_frames_numpy),
+				('polyedge_weaving', kagome.polyedge_weaving),
+				('polyedge_weaving_np', kagome.polyedge_weaving_numpy),
+				('polyedge_graph', kagome.polyedge_graph),
+				('colouring', lambda: kagome_polyedge_colouring(kagome)),
+				('colouring_struct', lambda: kagome_polyedge_structured_colouring(kagome)),
+				]:
+				_, seconds, peak = measure(func, (), memory)
+				record(stage, name, k, size, seconds, peak)
+
+	for n in range(2, lattice_max + 1):
+		lines = lattice_lines(n)
+		_, seconds, peak = measure(trimesh_skeleton, (Mesh, lines, .4), memory)
+		record('trimesh_skeleton', 'lattice', n, len(lines), seconds, peak)
+
+	# scaling exponents per stage and mesh, time ~ size ** exponent
+	exponents = {}
+	for r in records:
+		exponents.setdefault((r['stage'], r['mesh']), []).append(r)
+	print()
+	print('{:<18} {:<12} {:>9}'.format('stage', 'mesh', 'exponent'))
+	scaling = []
+	for (stage, mesh), rs in exponents.items():
+		exponent = scaling_exponent([r['size'] for r in rs], [r['seconds'] for r in rs])
+		scaling.append({'stage': stage, 'mesh': mesh, 'exponent': exponent})
+		print('{:<18} {:<12} {:>9}'.format(stage, mesh, '-' if exponent is None else '{:.2f}'.format(exponent)))
+
+	return {'records': records, 'scaling': scaling}
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description='Benchmark kagome generation and post-processing.')
+	parser.add_argument('--kmax', type=int, default=6, help='maximum number of subdivisions')
+	parser.add_argument('--lattice-max', type=int, default=5, help='maximum lattice size for the skeleton')
+	parser.add_argument('--max-faces', type=int, default=200000, help='skip subdivisions beyond this number of dense faces')
+	parser.add_argument('--no-memory', action='store_true', help='do not trace peak memory')
+	parser.add_argument('--json', help='dump the results to this file')
+	args = parser.parse_args()
+
+	results = run(args.kmax, args.lattice_max, args.max_faces, not args.no_memory)
+
+	if args.json:
+		with open(args.json, 'w') as f:
+			json.dump(results, f, indent=4)
@@ -0,0 +1,36 @@
+from __future__ import print_function
+
+import time
+
+from compas.datastructures import Mesh
+
+from compas_kagome.kagome import Kagome
+from compas_kagome.polyedges import trace_polyedges_reference
+
+
+def timed(func, *args):
+	t0 = time.time()
+	result = func(*args)
+	return result, time.time() - t0
+
+
+if __name__ == '__main__':
+
+	processes = 4
+
+	coarse_meshes = {
+		'icosahedron': Mesh.from_polyhedron(20),
+		'patch': Mesh.from_vertices_and_faces(
+			[[0., 0., 0.], [1., 0., 0.], [1., 1., 0.], [0., 1., 0.], [0.5, 0.5, 0.]],
+			[[0, 1, 4], [1, 2, 4], [2, 3, 4], [3, 0, 4]]),
+	}
+
+	print('{:<12} {:>2} {:>8} {:>10} {:>10} {:>8} {:>10} {:>8}'.format('mesh', 'k', 'edges', 'reference', 'engine', 'speedup', 'parallel', 'speedup'))
+	for name, coarse_mesh in coarse_meshes.items():
+		for k in range(1, 6):
+			kagome = Kagome.from_mesh(coarse_mesh, k=k)
+			reference, t_reference = timed(trace_polyedges_reference, kagome)
+			polyedges, t_engine = timed(kagome.polyedges)
+			# parallel tracing, including the pool start-up, against the serial engine
+			polyedges, t_parallel = timed(kagome.polyedges, processes)
+			print('{:<12} {:>2} {:>8} {:>10.4f} {:>10.4f} {:>8.1f} {:>10.4f} {:>8.1f}'.format(name, k, kagome.number_of_edges(), t_reference, t_engine, t_reference / t_engine, t_parallel, t_engine / t_parallel))
@@ -63,7 +63,9 @@ setup(
     python_requires=">=3.6",
     extras_require=optional_requirements,
     entry_points={
-        "console_scripts": [],
+        "console_scripts": [
+            "compas_kagome_batch = compas_kagome.batch:main",
+        ],
     },
     ext_modules=[],
 )
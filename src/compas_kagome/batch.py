@@ -0,0 +1,252 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+import traceback
+
+from multiprocessing import cpu_count
+
+from compas.datastructures import Mesh
+
+from compas_kagome.kagome import Kagome
+from compas_kagome.colouring import kagome_polyedge_colouring
+from compas_kagome.colouring import kagome_polyedge_structured_colouring
+from compas_kagome.profiling import profile
+from compas_kagome.skeleton import trimesh_skeleton
+
+
+__all__ = [
+	'kagome_jobs',
+	'skeleton_jobs',
+	'run_job',
+	'run_jobs',
+	'completed_jobs',
+	'main',
+	]
+
+
+MESH_READERS = {
+	'.obj': Mesh.from_obj,
+	'.off': Mesh.from_off,
+	'.ply': Mesh.from_ply,
+	'.json': Mesh.from_json,
+	}
+
+MANIFEST = 'manifest.jsonl'
+
+
+### jobs ###
+
+def _input_files(directory, extensions):
+	return sorted(name for name in os.listdir(directory) if os.path.splitext(name)[1].lower() in extensions)
+
+
+def _job_name(name, label, params):
+	# the input extension and the options are part of the name, so that sweeps with other options or inputs sharing a stem do not collide
+	stem, ext = os.path.splitext(name)
+	digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+	return '{}_{}_{}_{}'.format(stem, ext.lstrip('.').lower(), label, digest)
+
+
+def kagome_jobs(input_dir, output_dir, ks, fixed_boundary=True, use_numpy=False, weave=True, colouring='greedy'):
+
+	# one job per coarse mesh and subdivision level
+	jobs = []
+	for name in _input_files(input_dir, MESH_READERS):
+		for k in ks:
+			params = {'k': k, 'fixed_boundary': fixed_boundary, 'use_numpy': use_numpy, 'weave': weave, 'colouring': colouring}
+			job = _job_name(name, 'k{}'.format(k), params)
+			jobs.append({
+				'job': job,
+				'type': 'kagome',
+				'input': os.path.join(input_dir, name),
+				'output': os.path.join(output_dir, job),
+				'params': params,
+				})
+	return jobs
+
+
+def skeleton_jobs(input_dir, output_dir, radii, use_numpy=False):
+
+	# one job per line file, a json list of pairs of points, and radius
+	jobs = []
+	for name in _input_files(input_dir, ['.json']):
+		for radius in radii:
+			params = {'radius': radius, 'use_numpy': use_numpy}
+			job = _job_name(name, 'r{}'.format(radius), params)
+			jobs.append({
+				'job': job,
+				'type': 'skeleton',
+				'input': os.path.join(input_dir, name),
+				'output': os.path.join(output_dir, job + '.json'),
+				'params': params,
+				})
+	return jobs
+
+
+### run ###
+
+def _run_kagome(job, output):
+	params = job['params']
+	coarse_mesh = MESH_READERS[os.path.splitext(job['input'])[1].lower()](job['input'])
+	if params['use_numpy']:
+		kagome = Kagome.from_mesh_numpy(coarse_mesh, params['k'], params['fixed_boundary'])
+	else:
+		kagome = Kagome.from_mesh(coarse_mesh, params['k'], params['fixed_boundary'])
+	kagome.store_polyedge_data()
+	colours = None
+	if params['colouring'] == 'greedy':
+		colours = kagome_polyedge_colouring(kagome)
+	elif params['colouring'] == 'structured':
+		colours = list(kagome_polyedge_structured_colouring(kagome))
+	kagome.to_npy(output, params['weave'], colours)
+	return {'vertices': kagome.number_of_vertices(), 'faces': kagome.number_of_faces(), 'polyedges': len(kagome.polyedge_data)}
+
+
+def _run_skeleton(job, output):
+	params = job['params']
+	with open(job['input']) as f:
+		lines = json.load(f)
+	mesh = trimesh_skeleton(Mesh, lines, params['radius'], use_numpy=params['use_numpy'])
+	mesh.to_json(output)
+	return {'vertices': mesh.number_of_vertices(), 'faces': mesh.number_of_faces()}
+
+
+def _remove(path):
+	if os.path.isdir(path):
+		shutil.rmtree(path)
+	elif os.path.exists(path):
+		os.remove(path)
+
+
+def run_job(job):
+
+	# outputs are written next to their final path and moved there once complete, so that interrupted jobs leave nothing behind
+	output = job['output']
+	partial = output + '.partial'
+	t0 = time.time()
+	record = {'job': job['job'], 'type': job['type'], 'input': job['input'], 'output': output, 'params': job['params']}
+	_remove(partial)
+	try:
+		with profile() as stats:
+			if job['type'] == 'kagome':
+				record['counts'] = _run_kagome(job, partial)
+			else:
+				record['counts'] = _run_skeleton(job, partial)
+		if os.path.isdir(output):
+			shutil.rmtree(output)
+		os.replace(partial, output)
+		record['status'] = 'done'
+		record['stages'] = stats.data['stages']
+	except Exception:
+		record['status'] = 'failed'
+		record['error'] = traceback.format_exc()
+		_remove(partial)
+	record['seconds'] = time.time() - t0
+	return record
+
+
+def completed_jobs(output_dir):
+
+	# parameters of the jobs recorded as done in the manifest whose output is still there
+	done = {}
+	path = os.path.join(output_dir, MANIFEST)
+	if not os.path.exists(path):
+		return done
+	with open(path) as f:
+		for line in f:
+			try:
+				record = json.loads(line)
+			except ValueError:
+				continue
+			if record.get('status') == 'done' and os.path.exists(record['output']):
+				done[record['job']] = (record['input'], record['output'], record['params'])
+			else:
+				done.pop(record.get('job'), None)
+	return done
+
+
+def run_jobs(jobs, output_dir, processes=None, force=False, verbose=True):
+
+	if not os.path.exists(output_dir):
+		os.makedirs(output_dir)
+	done = {} if force else completed_jobs(output_dir)
+	todo = [job for job in jobs if done.get(job['job']) != (job['input'], job['output'], job['params'])]
+	if verbose:
+		print('{} jobs, {} already done, {} to run'.format(len(jobs), len(jobs) - len(todo), len(todo)))
+
+	records = []
+	with open(os.path.join(output_dir, MANIFEST), 'a') as manifest:
+
+		def write(record):
+			# one line per finished job, flushed so that a killed sweep can resume from there
+			manifest.write(json.dumps(record) + '\n')
+			manifest.flush()
+			records.append(record)
+			if verbose:
+				print('{:<8} {:<40} {:>10.3f}'.format(record['status'], record['job'], record['seconds']))
+
+		if processes is not None and processes != 1 and len(todo) > 1:
+			from multiprocessing import Pool
+			pool = Pool(processes)
+			try:
+				for record in pool.imap_unordered(run_job, todo):
+					write(record)
+			finally:
+				pool.close()
+				pool.join()
+		else:
+			for job in todo:
+				write(run_job(job))
+
+	return records
+
+
+### command line ###
+
+def main(argv=None):
+
+	parser = argparse.ArgumentParser(description='Generate kagome patterns or skeleton meshes for a directory of inputs.')
+	subparsers = parser.add_subparsers(dest='command')
+	subparsers.required = True
+
+	kagome_parser = subparsers.add_parser('kagome', help='kagome patterns from coarse triangle meshes (.obj, .off, .ply, .json)')
+	kagome_parser.add_argument('-k', type=int, nargs='+', default=[1], help='subdivision levels')
+	kagome_parser.add_argument('--free-boundary', action='store_true', help='do not fix the boundary vertices during subdivision')
+	kagome_parser.add_argument('--colouring', choices=['greedy', 'structured', 'none'], default='greedy', help='polyedge colouring')
+	kagome_parser.add_argument('--no-weave', action='store_true', help='do not store the weaving offsets')
+
+	skeleton_parser = subparsers.add_parser('skeleton', help='skeleton meshes from json lists of lines')
+	skeleton_parser.add_argument('-r', '--radius', type=float, nargs='+', default=[1.], help='skeleton radii')
+
+	for subparser in (kagome_parser, skeleton_parser):
+		subparser.add_argument('input_dir', help='directory of input files')
+		subparser.add_argument('output_dir', help='directory of outputs and manifest')
+		subparser.add_argument('-p', '--processes', type=int, default=1, help='number of worker processes, all cores if 0')
+		subparser.add_argument('--numpy', action='store_true', help='use the numpy implementations')
+		subparser.add_argument('--force', action='store_true', help='rerun the jobs already done')
+
+	args = parser.parse_args(argv)
+
+	if args.command == 'kagome':
+		jobs = kagome_jobs(args.input_dir, args.output_dir, args.k, not args.free_boundary, args.numpy, not args.no_weave, args.colouring)
+	else:
+		jobs = skeleton_jobs(args.input_dir, args.output_dir, args.radius, args.numpy)
+
+	processes = args.processes or cpu_count()
+	records = run_jobs(jobs, args.output_dir, processes, args.force)
+	return 1 if any(record['status'] == 'failed' for record in records) else 0
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+	raise SystemExit(main())
@@ -2,47 +2,106 @@ from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import division
 
-from compas.datastructures import Network
-
-from compas.geometry import centroid_points
+from array import array
+from collections import deque
 
 from compas.topology import vertex_coloring
 
-from compas.utilities import pairwise
+from compas_kagome.profiling import stage
 
 
 __all__ = [
 	'kagome_polyedge_colouring',
+	'kagome_polyedge_structured_colouring',
 	'kagome_polyline_colouring'
 	]
 
 
 def kagome_polyedge_colouring(kagome):
 
-	polyedges = kagome.polyedge_data
-
-	edge_to_polyedge_index = {vkey: {} for vkey in kagome.vertices()}
-	for i, polyedge in enumerate(polyedges):
-		for u, v in pairwise(polyedge):
-			edge_to_polyedge_index[u][v] = i
-			edge_to_polyedge_index[v][u] = i
-
-	vertices = [centroid_points([kagome.vertex_coordinates(vkey) for vkey in polyedge]) for polyedge in polyedges]
+	offsets, indices = kagome.polyedge_adjacency()
 
-	edges = []
-	for idx, polyedge in enumerate(polyedges):
-		for vkey in polyedge:
-			for vkey_2 in kagome.vertex_neighbors(vkey):
-				idx_2 = edge_to_polyedge_index[vkey][vkey_2]
-				if idx_2 != idx and idx < idx_2 and (idx, idx_2) not in edges:
-					edges.append((idx, idx_2))
-
-	polyedge_network = Network.from_nodes_and_edges(vertices, edges)
-
-	key_to_colour = vertex_coloring(polyedge_network.adjacency)
+	with stage('colouring') as s:
+		adjacency = {i: set(indices[offsets[i]: offsets[i + 1]]) for i in range(len(offsets) - 1)}
+		key_to_colour = vertex_coloring(adjacency)
+		s.count(len(adjacency))
 
 	return [key_to_colour[key] for key in sorted(key_to_colour.keys())]
 
+def _recolour(colours, region, offsets, indices):
+
+	# colour classes of the general algorithm on the region, each class then taking the first colour free around it
+	colours = array('i', colours)
+	for idx in region:
+		colours[idx] = -1
+	region_set = set(region)
+	key_to_colour = vertex_coloring({idx: set(nbr for nbr in indices[offsets[idx]: offsets[idx + 1]] if nbr in region_set) for idx in region})
+	classes = {}
+	for idx in region:
+		classes.setdefault(key_to_colour[idx], []).append(idx)
+	for key in sorted(classes):
+		used = set(colours[nbr] for idx in classes[key] for nbr in indices[offsets[idx]: offsets[idx + 1]])
+		colour = 0
+		while colour in used:
+			colour += 1
+		for idx in classes[key]:
+			colours[idx] = colour
+	return colours
+
+def kagome_polyedge_structured_colouring(kagome):
+
+	edge_to_polyedge_index = kagome.polyedge_index().edge_polyedge
+	offsets, indices = kagome.polyedge_adjacency()
+	n = len(offsets) - 1
+
+	with stage('structured_colouring') as s:
+		tri_faces = kagome.tri_faces()
+		tri_polyedges = {fkey: [edge_to_polyedge_index[edge] for edge in kagome.face_halfedges(fkey)] for fkey in tri_faces}
+		vertex_tri_faces = {}
+		for fkey in tri_faces:
+			for vkey in kagome.face_vertices(fkey):
+				vertex_tri_faces.setdefault(vkey, []).append(fkey)
+
+		# propagate the three polyedge families accross the triangles sharing a vertex
+		colours = array('i', [-1] * n)
+		visited = set()
+		for seed in tri_faces:
+			if seed in visited:
+				continue
+			visited.add(seed)
+			queue = deque([seed])
+			while queue:
+				fkey = queue.popleft()
+				polyedges = tri_polyedges[fkey]
+				used = set(colours[idx] for idx in polyedges if colours[idx] >= 0)
+				if len(set(polyedges)) == 3 and len(used) == len([idx for idx in polyedges if colours[idx] >= 0]):
+					free = [colour for colour in range(3) if colour not in used]
+					for idx in polyedges:
+						if colours[idx] < 0:
+							colours[idx] = free.pop(0)
+				for vkey in kagome.face_vertices(fkey):
+					for nbr in vertex_tri_faces[vkey]:
+						if nbr not in visited:
+							visited.add(nbr)
+							queue.append(nbr)
+
+		# near singularities, the families do not close up: the conflicting polyedges are recoloured locally with the general algorithm
+		conflicts = [idx for idx in range(n) if colours[idx] < 0 or any(colours[idx] == colours[nbr] for nbr in indices[offsets[idx]: offsets[idx + 1]])]
+		colours = _recolour(colours, conflicts, offsets, indices)
+
+		# a fourth colour may be forced by the structured colours around the conflicts, which are then recoloured with them
+		if len(set(colours)) > 3:
+			region = set(conflicts)
+			for idx in conflicts:
+				region.update(indices[offsets[idx]: offsets[idx + 1]])
+			candidate = _recolour(colours, sorted(region), offsets, indices)
+			if len(set(candidate)) < len(set(colours)):
+				colours = candidate
+
+		s.count(n)
+
+	return colours
+
 def kagome_polyline_colouring(kagome):
 
 	return {tuple([tuple(kagome.vertex_coordinates(vkey)) for vkey in polyedge]): colour for polyedge, colour in kagome_polyedge_colouring(kagome).items()}
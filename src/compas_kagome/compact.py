@@ -0,0 +1,378 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import json
+import os
+
+from itertools import chain
+
+import numpy as np
+
+from compas_kagome.polyedges import trace_polyedges
+from compas_kagome.polyedges import trace_polyedges_parallel
+
+
+__all__ = [
+	'CompactKagome',
+	'faces_to_csr',
+	'halfedge_arrays',
+	'mesh_edges_order',
+	]
+
+
+### halfedges ###
+
+def faces_to_csr(faces):
+
+	faces = list(faces)
+	offsets = np.zeros(len(faces) + 1, dtype=np.int32)
+	offsets[1:] = np.cumsum([len(face) for face in faces])
+	indices = np.fromiter(chain.from_iterable(faces), dtype=np.int32, count=offsets[-1])
+	return offsets, indices
+
+
+def halfedge_arrays(face_offsets, face_indices, number_of_vertices):
+
+	# face halfedges in face order, followed by the halfedges of the boundaries
+	degree = np.diff(face_offsets)
+	n = len(face_indices)
+	face = np.repeat(np.arange(len(degree), dtype=np.int32), degree)
+	nxt = np.arange(1, n + 1, dtype=np.int32)
+	last = face_offsets[1:] - 1
+	nxt[last] = face_offsets[:-1]
+	origin = np.asarray(face_indices, dtype=np.int32)
+	head = origin[nxt]
+
+	keys = origin.astype(np.int64) * number_of_vertices + head
+	order = np.argsort(keys, kind='stable')
+	idx = np.searchsorted(keys[order], head.astype(np.int64) * number_of_vertices + origin)
+	idx[idx == n] = 0
+	twin = np.where(keys[order][idx] == head.astype(np.int64) * number_of_vertices + origin, order[idx], -1).astype(np.int32)
+
+	# close the boundaries with halfedges pointing to the `None` face
+	open_ = np.flatnonzero(twin < 0)
+	m = len(open_)
+	bdry = np.arange(n, n + m, dtype=np.int32)
+	twin[open_] = bdry
+	bdry_origin = head[open_]
+	bdry_out = np.full(number_of_vertices, -1, dtype=np.int32)
+	bdry_out[bdry_origin] = bdry
+
+	origin = np.concatenate((origin, bdry_origin))
+	face = np.concatenate((face, np.full(m, -1, dtype=np.int32)))
+	twin = np.concatenate((twin, open_.astype(np.int32)))
+	nxt = np.concatenate((nxt, bdry_out[origin[open_]]))
+
+	return origin, twin, nxt, face
+
+
+def mesh_edges_order(origin, twin, face, number_of_vertices):
+
+	# edges in the order of Mesh.edges() for a mesh built with from_vertices_and_faces:
+	# vertices in order, then neighbours in order of halfedge insertion
+	h = np.arange(len(origin), dtype=np.int64)
+	time = np.where(face < 0, len(origin) + h, h)
+	time = np.minimum(time, time[twin])
+	head = origin[twin]
+	edges = np.flatnonzero(origin < head)
+	edges = edges[np.lexsort((time[edges], origin[edges]))]
+	return edges.astype(np.int32)
+
+
+### compact kagome ###
+
+# directory layout of CompactKagome.save_npy
+NPY_FORMAT = 'compas_kagome.npy'
+NPY_ARRAYS = ['xyz', 'face_offsets', 'face_indices', 'vertex_keys', 'face_keys', 'halfedge_vertex', 'halfedge_twin', 'halfedge_next', 'halfedge_face']
+NPY_POLYEDGE_ARRAYS = ['polyedge_offsets', 'polyedge_indices', 'polyedge_weave', 'polyedge_colours']
+
+
+class CompactKagome(object):
+
+	def __init__(self, xyz, face_offsets, face_indices, vertex_keys=None, face_keys=None):
+		self.xyz = np.ascontiguousarray(xyz, dtype=np.float64).reshape((-1, 3))
+		self.face_offsets = np.asarray(face_offsets, dtype=np.int32)
+		self.face_indices = np.asarray(face_indices, dtype=np.int32)
+		v = len(self.xyz)
+		f = len(self.face_offsets) - 1
+		self.vertex_keys = np.arange(v, dtype=np.int32) if vertex_keys is None else np.asarray(vertex_keys, dtype=np.int32)
+		self.face_keys = np.arange(f, dtype=np.int32) if face_keys is None else np.asarray(face_keys, dtype=np.int32)
+		self.halfedge_vertex, self.halfedge_twin, self.halfedge_next, self.halfedge_face = halfedge_arrays(self.face_offsets, self.face_indices, v)
+		self.polyedge_data = None
+
+	@property
+	def polyedge_data(self):
+		# polyedges loaded as ragged arrays are only turned into lists when asked for
+		if self._polyedge_data is None and self.polyedge_offsets is not None:
+			keys = self.vertex_keys[self.polyedge_indices].tolist()
+			offsets = self.polyedge_offsets.tolist()
+			self._polyedge_data = [keys[i: j] for i, j in zip(offsets[:-1], offsets[1:])]
+		return self._polyedge_data
+
+	@polyedge_data.setter
+	def polyedge_data(self, polyedge_data):
+		self._polyedge_data = polyedge_data
+		self.polyedge_offsets = None
+		self.polyedge_indices = None
+		self.polyedge_weave = None
+		self.polyedge_colours = None
+
+	def polyedge_arrays(self):
+		# polyedges as offsets and vertex indices
+		if self.polyedge_offsets is not None:
+			return self.polyedge_offsets, self.polyedge_indices
+		if self.polyedge_data is None:
+			raise ValueError('No polyedges stored, call store_polyedge_data first')
+		offsets, indices = faces_to_csr(self.polyedge_data)
+		return offsets, self.vertex_indices(indices)
+
+	### from / to ###
+
+	@classmethod
+	def from_vertices_and_faces(cls, vertices, faces):
+		return cls(vertices, *faces_to_csr(faces))
+
+	@classmethod
+	def from_mesh(cls, coarse_mesh, k=1, fixed_boundary=True):
+		from compas_kagome.subdivision import kagome_vertices_and_faces_numpy
+		vertices, faces = coarse_mesh.to_vertices_and_faces()
+		key_index = coarse_mesh.key_index()
+		fixed = [key_index[vkey] for vkey in coarse_mesh.vertices_on_boundary()] if fixed_boundary else None
+		return cls(*kagome_vertices_and_faces_numpy(vertices, faces, k, fixed))
+
+	@classmethod
+	def from_kagome(cls, kagome):
+		vertex_keys = list(kagome.vertices())
+		key_index = {vkey: i for i, vkey in enumerate(vertex_keys)}
+		face_keys = list(kagome.faces())
+		xyz = [kagome.vertex_coordinates(vkey) for vkey in vertex_keys]
+		faces = [[key_index[vkey] for vkey in kagome.face_vertices(fkey)] for fkey in face_keys]
+		compact = cls.from_vertices_and_faces(xyz, faces)
+		compact.vertex_keys = np.asarray(vertex_keys, dtype=np.int32)
+		compact.face_keys = np.asarray(face_keys, dtype=np.int32)
+		# traced if need be, so that a saved kagome always holds its polyedge arrays
+		compact.polyedge_data = [list(polyedge) for polyedge in kagome.polyedge_data]
+		return compact
+
+	@classmethod
+	def from_npy(cls, path, mmap_mode='r'):
+		# arrays are memory-mapped by default, so that nothing is read before it is used
+		with open(os.path.join(path, 'kagome.json')) as f:
+			meta = json.load(f)
+		if meta.get('format') != NPY_FORMAT:
+			raise ValueError('Not a kagome directory: {}'.format(path))
+		arrays = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode) for name in meta['arrays']}
+		compact = cls.__new__(cls)
+		for name in NPY_ARRAYS:
+			setattr(compact, name, arrays[name])
+		compact._polyedge_data = None
+		for name in NPY_POLYEDGE_ARRAYS:
+			setattr(compact, name, arrays.get(name))
+		return compact
+
+	def save_npy(self, path, weave=True, colours=None):
+		# one .npy file per array in a directory, with the list of arrays in kagome.json
+		if not os.path.exists(path):
+			os.makedirs(path)
+		arrays = {name: getattr(self, name) for name in NPY_ARRAYS}
+		if self.polyedge_data is not None:
+			arrays['polyedge_offsets'], arrays['polyedge_indices'] = self.polyedge_arrays()
+			if self.polyedge_weave is not None:
+				arrays['polyedge_weave'] = self.polyedge_weave
+			elif weave:
+				arrays['polyedge_weave'] = self.polyedge_weave_array()
+			if colours is not None:
+				arrays['polyedge_colours'] = np.asarray(colours, dtype=np.int32)
+			elif self.polyedge_colours is not None:
+				arrays['polyedge_colours'] = self.polyedge_colours
+		for name, array in arrays.items():
+			np.save(os.path.join(path, name + '.npy'), np.ascontiguousarray(array))
+		meta = {
+			'format': NPY_FORMAT,
+			'version': 1,
+			'vertices': self.number_of_vertices(),
+			'faces': self.number_of_faces(),
+			'arrays': sorted(arrays),
+			}
+		with open(os.path.join(path, 'kagome.json'), 'w') as f:
+			json.dump(meta, f, indent=4)
+
+	def to_vertices_and_faces(self):
+		indices = self.face_indices.tolist()
+		offsets = self.face_offsets.tolist()
+		return self.xyz.tolist(), [indices[i: j] for i, j in zip(offsets[:-1], offsets[1:])]
+
+	def to_kagome(self, cls=None):
+		if cls is None:
+			from compas_kagome.kagome import Kagome as cls
+		kagome = cls()
+		vertex_keys = self.vertex_keys.tolist()
+		for vkey, (x, y, z) in zip(vertex_keys, self.xyz.tolist()):
+			kagome.add_vertex(key=vkey, x=x, y=y, z=z)
+		_, faces = self.to_vertices_and_faces()
+		for fkey, face in zip(self.face_keys.tolist(), faces):
+			kagome.add_face([vertex_keys[i] for i in face], fkey=fkey)
+		if self.polyedge_data is not None:
+			kagome.polyedge_data = [list(polyedge) for polyedge in self.polyedge_data]
+		return kagome
+
+	### counts ###
+
+	def number_of_vertices(self):
+		return len(self.xyz)
+
+	def number_of_faces(self):
+		return len(self.face_offsets) - 1
+
+	def number_of_edges(self):
+		return len(self.halfedge_vertex) // 2
+
+	@property
+	def nbytes(self):
+		arrays = [self.xyz, self.face_offsets, self.face_indices, self.vertex_keys, self.face_keys,
+			self.halfedge_vertex, self.halfedge_twin, self.halfedge_next, self.halfedge_face]
+		return sum(array.nbytes for array in arrays)
+
+	def face_degrees(self):
+		return np.diff(self.face_offsets)
+
+	def vertex_degrees(self):
+		return np.bincount(self.halfedge_vertex, minlength=self.number_of_vertices())
+
+	def halfedge_head(self):
+		return self.halfedge_vertex[self.halfedge_next]
+
+	def halfedge_index(self, u, v):
+		# halfedge indices of vertex index pairs, -1 if not in the mesh
+		n = self.number_of_vertices()
+		keys = self.halfedge_vertex.astype(np.int64) * n + self.halfedge_head()
+		order = np.argsort(keys, kind='stable')
+		query = np.asarray(u, dtype=np.int64) * n + np.asarray(v, dtype=np.int64)
+		idx = np.searchsorted(keys[order], query)
+		idx[idx == len(keys)] = 0
+		return np.where(keys[order][idx] == query, order[idx], -1)
+
+	def vertex_indices(self, vkeys):
+		vkeys = np.asarray(vkeys, dtype=np.int32)
+		if np.array_equal(self.vertex_keys, np.arange(self.number_of_vertices())):
+			return vkeys
+		order = np.argsort(self.vertex_keys)
+		return order[np.searchsorted(self.vertex_keys[order], vkeys)]
+
+	### faces ###
+
+	def hex_faces(self):
+		return self.face_keys[self.face_degrees() == 6].tolist()
+
+	def tri_faces(self):
+		return self.face_keys[self.face_degrees() == 3].tolist()
+
+	### singularities ###
+
+	def _face_neighbor_degrees(self):
+		f = self.number_of_faces()
+		n = len(self.face_indices)
+		degree = self.face_degrees()
+		nbr = self.halfedge_face[self.halfedge_twin[:n]]
+		face = self.halfedge_face[:n][nbr >= 0]
+		nbr = nbr[nbr >= 0]
+		count = np.bincount(face, minlength=f)
+		tri = np.bincount(face, weights=(degree[nbr] == 3).astype(float), minlength=f)
+		hexa = np.bincount(face, weights=(degree[nbr] == 6).astype(float), minlength=f)
+		return degree, count, tri, hexa
+
+	def store_polyedge_data(self, processes=None):
+		self.polyedge_data = self.polyedges(processes)
+
+	def singularities(self):
+		degree, count, tri, hexa = self._face_neighbor_degrees()
+		singular_hex = (tri == count) & (degree != 6)
+		singular_tri = (hexa == count) & (degree != 3)
+		return self.face_keys[singular_hex | singular_tri].tolist()
+
+	def negative_singularities(self):
+		degree, count, tri, hexa = self._face_neighbor_degrees()
+		return self.face_keys[(tri == count) & (degree > 6)].tolist()
+
+	### polyedges ###
+
+	def halfedge_opposite(self):
+
+		# halfedge continuing each halfedge accross its head vertex, -1 at extremities
+		origin, twin, nxt, face = self.halfedge_vertex, self.halfedge_twin, self.halfedge_next, self.halfedge_face
+		head = origin[nxt]
+		degree = self.vertex_degrees()[head]
+		on_boundary = (face < 0) | (face[twin] < 0)
+
+		opposite = np.full(len(origin), -1, dtype=np.int32)
+
+		# four-valent vertices: two rotations around the head vertex
+		rot = nxt[twin[nxt]]
+		four = degree == 4
+		opposite[four] = rot[four]
+
+		# three-valent vertices: continue along the boundary
+		first = nxt
+		second = nxt[twin[nxt]]
+		three = (degree == 3) & on_boundary
+		use_first = three & on_boundary[first]
+		use_second = three & ~on_boundary[first] & on_boundary[second]
+		opposite[use_first] = first[use_first]
+		opposite[use_second] = second[use_second]
+
+		return opposite
+
+	def polyedges(self, processes=None):
+
+		origin = self.halfedge_vertex.tolist()
+		head = self.halfedge_head().tolist()
+		twin = self.halfedge_twin.tolist()
+		opposite = self.halfedge_opposite().tolist()
+		seeds = mesh_edges_order(self.halfedge_vertex, self.halfedge_twin, self.halfedge_face, self.number_of_vertices()).tolist()
+
+		if processes is not None and processes != 1:
+			polyedges = trace_polyedges_parallel(seeds, origin, twin, head, opposite, self.number_of_vertices(), processes)
+		else:
+			polyedges = trace_polyedges(seeds, origin, twin, head, opposite, self.number_of_vertices())
+
+		keys = self.vertex_keys.tolist()
+		return [[keys[i] for i in polyedge] for polyedge in polyedges]
+
+	def polyline_frames(self):
+		from compas_kagome.frames import vertex_normals_numpy
+		from compas_kagome.frames import polyline_frames_numpy
+		offsets, indices = self.polyedge_arrays()
+		normals = vertex_normals_numpy(self.xyz, self.face_offsets, self.face_indices)
+		return polyline_frames_numpy(self.xyz, normals, offsets, indices), offsets
+
+	### weave ###
+
+	def polyedge_weave_array(self):
+		# weave offsets as one int8 array aligned with the polyedge indices
+		from compas_kagome.weaving import polyedge_weaving_numpy
+		if self.polyedge_weave is not None:
+			return self.polyedge_weave
+		offsets, vertices = self.polyedge_arrays()
+		return polyedge_weaving_numpy(self.face_offsets, self.face_indices, offsets, vertices, self.number_of_vertices())
+
+	def polyedge_weaving(self):
+
+		offsets = np.asarray(self.polyedge_arrays()[0]).tolist()
+		weave = self.polyedge_weave_array().tolist()
+		return [weave[i: j] for i, j in zip(offsets[:-1], offsets[1:])]
+
+	def polyedge_weaving_violations(self):
+		# vertex keys where the crossing polyedges do not have opposite offsets, and where faces disagree on an offset
+		from compas_kagome.weaving import weaving_violations_numpy
+		offsets, vertices = self.polyedge_arrays()
+		crossings, conflicts = weaving_violations_numpy(self.face_offsets, self.face_indices, offsets, vertices, self.polyedge_weave_array(), self.number_of_vertices())
+		return self.vertex_keys[crossings].tolist(), self.vertex_keys[conflicts].tolist()
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+	pass
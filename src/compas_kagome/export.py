@@ -0,0 +1,98 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import csv
+import struct
+import sys
+
+from array import array
+
+
+__all__ = [
+	'polyedges_to_csv',
+	'polyedges_to_binary',
+	'polyedges_from_binary',
+	]
+
+
+# binary layout: a header, then per polyedge its index and length, its points, frames and weave offsets, little-endian
+BINARY_MAGIC = b'KGPE'
+BINARY_HEADER = struct.Struct('<4sIII')
+BINARY_RECORD = struct.Struct('<ii')
+
+
+def polyedges_to_csv(kagome, filepath, frames=True, weave=True):
+
+	# one row per polyedge vertex, written as the polyedges are streamed
+	header = ['polyedge', 'vertex', 'x', 'y', 'z']
+	if frames:
+		header += ['nx', 'ny', 'nz', 'tx', 'ty', 'tz', 'bx', 'by', 'bz']
+	if weave:
+		header += ['weave']
+	with open(filepath, 'w') as f:
+		writer = csv.writer(f, lineterminator='\n')
+		writer.writerow(header)
+		for i, points, polyedge_frames, polyedge_weave in kagome.iter_polyedges(frames, weave):
+			for j, point in enumerate(points):
+				row = [i, j] + list(point)
+				if frames:
+					row += [c for axis in polyedge_frames[j] for c in axis]
+				if weave:
+					row.append(polyedge_weave[j])
+				writer.writerow(row)
+
+
+def _write(f, values):
+	if sys.byteorder == 'big':
+		values.byteswap()
+	values.tofile(f)
+
+
+def _read(f, typecode, count):
+	values = array(typecode)
+	values.fromfile(f, count)
+	if sys.byteorder == 'big':
+		values.byteswap()
+	return values
+
+
+def polyedges_to_binary(kagome, filepath, frames=True, weave=True):
+
+	count = len(kagome.polyedge_data)
+	with open(filepath, 'wb') as f:
+		f.write(BINARY_HEADER.pack(BINARY_MAGIC, 1, count, int(frames) | int(weave) << 1))
+		for i, points, polyedge_frames, polyedge_weave in kagome.iter_polyedges(frames, weave):
+			f.write(BINARY_RECORD.pack(i, len(points)))
+			_write(f, array('d', [c for point in points for c in point]))
+			if frames:
+				_write(f, array('d', [c for frame in polyedge_frames for axis in frame for c in axis]))
+			if weave:
+				_write(f, array('b', polyedge_weave))
+
+
+def polyedges_from_binary(filepath):
+
+	# streams back (index, points, frames, weave) as written by polyedges_to_binary
+	with open(filepath, 'rb') as f:
+		magic, version, count, flags = BINARY_HEADER.unpack(f.read(BINARY_HEADER.size))
+		if magic != BINARY_MAGIC:
+			raise ValueError('Not a polyedge file: {}'.format(filepath))
+		for _ in range(count):
+			i, n = BINARY_RECORD.unpack(f.read(BINARY_RECORD.size))
+			xyz = _read(f, 'd', 3 * n)
+			points = [list(xyz[3 * j: 3 * j + 3]) for j in range(n)]
+			polyedge_frames = None
+			if flags & 1:
+				values = _read(f, 'd', 9 * n)
+				polyedge_frames = [[list(values[9 * j + 3 * k: 9 * j + 3 * k + 3]) for k in range(3)] for j in range(n)]
+			polyedge_weave = _read(f, 'b', n).tolist() if flags & 2 else None
+			yield i, points, polyedge_frames, polyedge_weave
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+	pass
@@ -0,0 +1,70 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import numpy as np
+
+from compas_kagome.compact import faces_to_csr
+
+
+__all__ = [
+	'vertex_normals_numpy',
+	'polyline_frames_numpy',
+	'kagome_polyline_frames_numpy',
+	]
+
+
+def vertex_normals_numpy(xyz, face_offsets, face_indices):
+
+	# area-weighted face normals accumulated once per vertex, as Mesh.vertex_normal
+	xyz = np.asarray(xyz, dtype=np.float64)
+	degree = np.diff(face_offsets)
+	face = np.repeat(np.arange(len(degree)), degree)
+	centroids = np.add.reduceat(xyz[face_indices], face_offsets[:-1], axis=0) / degree[:, None]
+	prev = np.arange(len(face_indices)) - 1
+	prev[face_offsets[:-1]] = face_offsets[1:] - 1
+	oa = xyz[face_indices[prev]] - centroids[face]
+	ob = xyz[face_indices] - centroids[face]
+	face_normals = np.add.reduceat(0.5 * np.cross(oa, ob), face_offsets[:-1], axis=0)
+
+	normals = np.zeros((len(xyz), 3))
+	np.add.at(normals, face_indices, face_normals[face])
+	return normals / np.linalg.norm(normals, axis=1)[:, None]
+
+
+def polyline_frames_numpy(xyz, normals, polyedge_offsets, polyedge_indices):
+
+	# frames of all polyedges as one (N, 3, 3) array of [normal, tangent, binormal]
+	xyz = np.asarray(xyz, dtype=np.float64)
+	start = polyedge_offsets[:-1]
+	end = polyedge_offsets[1:] - 1
+	closed = polyedge_indices[start] == polyedge_indices[end]
+
+	nxt = np.arange(1, len(polyedge_indices) + 1)
+	nxt[end] = np.where(closed, start + 1, end - 1)
+	sign = np.ones(len(polyedge_indices))
+	sign[end[~closed]] = -1.0
+
+	x = normals[polyedge_indices]
+	y = xyz[polyedge_indices[nxt]] - xyz[polyedge_indices]
+	y *= (sign / np.linalg.norm(y, axis=1))[:, None]
+	z = np.cross(x, y)
+	return np.stack((x, y, z), axis=1)
+
+
+def kagome_polyline_frames_numpy(kagome):
+
+	key_index = kagome.key_index()
+	xyz = np.array([kagome.vertex_coordinates(vkey) for vkey in kagome.vertices()])
+	face_offsets, face_indices = faces_to_csr([key_index[vkey] for vkey in kagome.face_vertices(fkey)] for fkey in kagome.faces())
+	polyedge_offsets, polyedge_indices = faces_to_csr([key_index[vkey] for vkey in polyedge] for polyedge in kagome.polyedge_data)
+	normals = vertex_normals_numpy(xyz, face_offsets, face_indices)
+	return polyline_frames_numpy(xyz, normals, polyedge_offsets, polyedge_indices), polyedge_offsets
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+	pass
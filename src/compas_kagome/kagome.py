@@ -13,52 +13,222 @@ from compas.datastructures import mesh_conway_ambo
 from compas.utilities import pairwise
 from compas.utilities import window
 
+from compas_kagome.profiling import stage
+from compas_kagome.singularities import FaceDegreeIndex
+from compas_kagome.polyedges import PolyedgeIndex
+from compas_kagome.polyedges import kagome_halfedge_opposites
+from compas_kagome.polyedges import kagome_halfedge_opposites_numpy
+from compas_kagome.polyedges import kagome_polyedge_crossings
+from compas_kagome.polyedges import crossings_to_csr
+from compas_kagome.polyedges import trace_polyedges
+from compas_kagome.polyedges import trace_polyedges_parallel
+
 __all__ = ['Kagome']
 
 
 class Kagome(Mesh):
 
 	def __init__(self):
+		self._face_degree_index = None
+		self._track_singularities = False
+		self._polyedge_data = None
+		self._polyedge_index = None
 		super(Kagome, self).__init__()
-		self.polyedge_data = None
+
+	### topology changes ###
+
+	def topology_changed(self, tracked = False):
+		# tracked if the edit already refreshed the face degree index, otherwise the index is rebuilt on next use
+		if not (tracked and self._track_singularities):
+			self._face_degree_index = None
+		self._polyedge_data = None
+		self._polyedge_index = None
+
+	def track_singularities(self, track = True):
+		# keep the face degree index and the singular faces up to date across add_face, delete_face and delete_vertex,
+		# the in-place operations below rebuilding it instead
+		self._track_singularities = track
+		if track:
+			self.face_degree_index()
+
+	def _tracked_faces(self, fkeys):
+		if not self._track_singularities or self._face_degree_index is None:
+			return None
+		return [fkey for fkey in fkeys if fkey is not None] + [nbr for fkey in fkeys if fkey is not None for nbr in self.face_neighbors(fkey)]
+
+	def add_vertex(self, *args, **kwargs):
+		key = super(Kagome, self).add_vertex(*args, **kwargs)
+		self.topology_changed(tracked = True)
+		return key
+
+	def add_face(self, *args, **kwargs):
+		fkey = super(Kagome, self).add_face(*args, **kwargs)
+		fkeys = self._tracked_faces([fkey])
+		if fkeys is not None:
+			self._face_degree_index.update(self, fkeys)
+		self.topology_changed(tracked = True)
+		return fkey
+
+	def delete_vertex(self, key):
+		fkeys = self._tracked_faces(self.vertex_faces(key))
+		super(Kagome, self).delete_vertex(key)
+		if fkeys is not None:
+			self._face_degree_index.update(self, fkeys)
+		self.topology_changed(tracked = True)
+
+	def delete_face(self, fkey):
+		fkeys = self._tracked_faces([fkey])
+		super(Kagome, self).delete_face(fkey)
+		if fkeys is not None:
+			self._face_degree_index.update(self, fkeys)
+		self.topology_changed(tracked = True)
+
+	# compas operations writing to self.face directly, bypassing add_face and delete_face
+
+	def _edited(self, result):
+		self.topology_changed()
+		return result
+
+	def split_edge(self, *args, **kwargs):
+		return self._edited(super(Kagome, self).split_edge(*args, **kwargs))
+
+	def split_face(self, *args, **kwargs):
+		return self._edited(super(Kagome, self).split_face(*args, **kwargs))
+
+	def split_strip(self, *args, **kwargs):
+		return self._edited(super(Kagome, self).split_strip(*args, **kwargs))
+
+	def collapse_edge(self, *args, **kwargs):
+		return self._edited(super(Kagome, self).collapse_edge(*args, **kwargs))
+
+	def merge_faces(self, *args, **kwargs):
+		return self._edited(super(Kagome, self).merge_faces(*args, **kwargs))
+
+	def flip_cycles(self, *args, **kwargs):
+		return self._edited(super(Kagome, self).flip_cycles(*args, **kwargs))
+
+	def unify_cycles(self, *args, **kwargs):
+		return self._edited(super(Kagome, self).unify_cycles(*args, **kwargs))
+
+	def clear(self):
+		super(Kagome, self).clear()
+		self._face_degree_index = None
+		self.topology_changed()
+		if self._track_singularities:
+			self.face_degree_index()
+
+	@property
+	def data(self):
+		return Mesh.data.fget(self)
+
+	@data.setter
+	def data(self, data):
+		# the data setter replaces the whole topology without going through the edit methods
+		Mesh.data.fset(self, data)
+		self._face_degree_index = None
+		self.topology_changed()
+		if self._track_singularities:
+			self.face_degree_index()
 
 	### from ###
 
 	@classmethod
-	def from_mesh(cls, coarse_mesh, k = 1, fixed_boundary = True):
-		if k > 0:
-			fixed = coarse_mesh.vertices_on_boundary() if fixed_boundary else None
-			dense_mesh = Mesh.from_vertices_and_faces(*trimesh_subdivide_loop(coarse_mesh, k, fixed).to_vertices_and_faces())
-		else:
-			dense_mesh = coarse_mesh
-		vertices, faces = mesh_conway_ambo(dense_mesh).to_vertices_and_faces()
-		return cls.from_vertices_and_faces(vertices, faces)
+	def from_mesh(cls, coarse_mesh, k = 1, fixed_boundary = True, pyramid = None):
+		with stage('loop_subdivision') as s:
+			if k > 0:
+				fixed = coarse_mesh.vertices_on_boundary() if fixed_boundary else None
+				if pyramid is not None:
+					# levels are subdivided one at a time, the same geometry as at once but with other vertex keys, hence no default pyramid here
+					key = pyramid.signature(*coarse_mesh.to_vertices_and_faces() + (fixed_boundary, 'mesh'))
+					dense_mesh = pyramid.subdivide(key, coarse_mesh, k, lambda mesh: trimesh_subdivide_loop(mesh, 1, fixed), Mesh.number_of_faces)
+				else:
+					dense_mesh = trimesh_subdivide_loop(coarse_mesh, k, fixed)
+				dense_mesh = Mesh.from_vertices_and_faces(*dense_mesh.to_vertices_and_faces())
+			else:
+				dense_mesh = coarse_mesh
+			s.count(dense_mesh.number_of_faces())
+		with stage('ambo') as s:
+			vertices, faces = mesh_conway_ambo(dense_mesh).to_vertices_and_faces()
+			s.count(len(faces))
+		with stage('kagome_construction') as s:
+			kagome = cls.from_vertices_and_faces(vertices, faces)
+			s.count(len(faces))
+		return kagome
+
+	@classmethod
+	def from_mesh_numpy(cls, coarse_mesh, k = 1, fixed_boundary = True, pyramid = None):
+		# subdivision levels are cached in compas_kagome.pyramid.DEFAULT_PYRAMID, unless another pyramid is given or pyramid is False
+		from compas_kagome.subdivision import kagome_vertices_and_faces_numpy
+		vertices, faces = coarse_mesh.to_vertices_and_faces()
+		key_index = coarse_mesh.key_index()
+		fixed = [key_index[vkey] for vkey in coarse_mesh.vertices_on_boundary()] if fixed_boundary else None
+		xyz, offsets, indices = kagome_vertices_and_faces_numpy(vertices, faces, k, fixed, pyramid)
+		with stage('kagome_construction') as s:
+			indices = indices.tolist()
+			offsets = offsets.tolist()
+			kagome = cls.from_vertices_and_faces(xyz.tolist(), [indices[i: j] for i, j in zip(offsets[:-1], offsets[1:])])
+			s.count(len(offsets) - 1)
+		return kagome
+
+	@classmethod
+	def from_compact(cls, compact):
+		return compact.to_kagome(cls)
+
+	@classmethod
+	def from_npy(cls, path):
+		from compas_kagome.compact import CompactKagome
+		return CompactKagome.from_npy(path).to_kagome(cls)
+
+	### to ###
+
+	def to_compact(self):
+		from compas_kagome.compact import CompactKagome
+		return CompactKagome.from_kagome(self)
+
+	def to_npy(self, path, weave=True, colours=None):
+		self.to_compact().save_npy(path, weave, colours)
+
+	def face_degree_index(self):
+		if self._face_degree_index is None:
+			self._face_degree_index = FaceDegreeIndex(self)
+		return self._face_degree_index
 
 	def hex_faces(self):
-		return [fkey for fkey in self.faces() if len(self.face_vertices(fkey)) == 6]
+		return self.face_degree_index().hex_faces()
 
 	def tri_faces(self):
-		return [fkey for fkey in self.faces() if len(self.face_vertices(fkey)) == 3]
+		return self.face_degree_index().tri_faces()
 
 	### singularities ###
 
-	def store_polyedge_data(self):
-		self.polyedge_data = self.polyedges()
+	@property
+	def polyedge_data(self):
+		# traced on first access, dropped whenever the topology changes
+		if self._polyedge_data is None:
+			self._polyedge_data = self.polyedges()
+		return self._polyedge_data
+
+	@polyedge_data.setter
+	def polyedge_data(self, polyedge_data):
+		self._polyedge_data = polyedge_data
+		self._polyedge_index = None
+
+	def store_polyedge_data(self, processes = None):
+		self.polyedge_data = self.polyedges(processes)
+		self._polyedge_index = PolyedgeIndex(self._polyedge_data)
+
+	def polyedge_index(self):
+		if self._polyedge_index is None or self._polyedge_index.polyedges is not self.polyedge_data:
+			self._polyedge_index = PolyedgeIndex(self.polyedge_data)
+		return self._polyedge_index
 
 	def singularities(self):
 
-		singular_faces = []
-		for fkey in self.faces():
-			singular_hex = all([len(self.face_vertices(nbr)) == 3 for nbr in self.face_neighbors(fkey)]) and len(self.face_vertices(fkey)) != 6
-			singular_tri = all([len(self.face_vertices(nbr)) == 6 for nbr in self.face_neighbors(fkey)]) and len(self.face_vertices(fkey)) != 3
-			if singular_hex or singular_tri:
-				singular_faces.append(fkey)
-				#singular_faces.append([self.vertex_coordinates(vkey) for vkey in self.face_vertices(fkey) + self.face_vertices(fkey)[: 1]])
-		return singular_faces
+		return self.face_degree_index().singularities()
 
 	def negative_singularities(self):
 
-		return [fkey for fkey in self.faces() if all([len(self.face_vertices(nbr)) == 3 for nbr in self.face_neighbors(fkey)]) and len(self.face_vertices(fkey)) > 6]
+		return self.face_degree_index().negative_singularities()
 
 	def negative_polygons(self):
 
@@ -110,27 +280,54 @@ class Kagome(Mesh):
 
 		return polyedge
 
-	def polyedges(self):
+	def polyedges(self, processes = None):
 
-		polyedges = []
+		# opposite halfedges are computed once, then each edge is visited once, or the edges are split across processes
+		with stage('polyedge_tracing') as s:
+			if processes is not None and processes != 1:
+				# the opposites of the halfedge arrays, so that building them does not outweigh the parallel tracing
+				origin, twin, head, opposite, seeds = kagome_halfedge_opposites_numpy(self)
+				keys = list(self.vertices())
+				polyedges = trace_polyedges_parallel(seeds, origin, twin, head, opposite, self.number_of_vertices(), processes)
+				polyedges = [[keys[i] for i in polyedge] for polyedge in polyedges]
+			else:
+				origin, twin, head, opposite = kagome_halfedge_opposites(self)
+				polyedges = trace_polyedges(range(0, len(origin), 2), origin, twin, head, opposite, self.number_of_vertices())
+			s.count(len(polyedges))
 
-		edge_visited = {(u, v): False for u, v in self.edges()}
+		return polyedges
 
-		for edge in self.edges():
-			if edge_visited[edge]:
-				continue
-			u0, v0 = edge
-			# collect new polyedge
-			polyedges.append(self.polyedge(u0, v0))
+	def patch_polyedges(self, vertices, edit):
 
-			# remove collected edges
-			for u, v in pairwise(polyedges[-1]):
-				#if (u, v) in edge_visited:
-				edge_visited[(u, v)] = True
-				#elif (v, u) in edge_visited:
-				edge_visited[(v, u)] = True
+		# runs edit(), which returns the vertices it added or reconnected, then retraces only the polyedges that went through
+		# the given vertices or go through the returned ones, the other polyedges keeping their ids
+		if self._polyedge_data is None:
+			edit()
+			return []
 
-		return polyedges
+		polyedges = self._polyedge_data
+		index = self.polyedge_index()
+		removed = sorted(set(i for vkey in vertices for i in index.vertex_polyedges.get(vkey, [])))
+		edges = [edge for i in removed for edge in pairwise(polyedges[i])]
+
+		touched = edit()
+		edges += [(u, v) for u in touched for v in self.vertex_neighbors(u)]
+
+		traced = []
+		visited = set()
+		for u, v in edges:
+			if (u, v) in visited or u not in self.halfedge or v not in self.halfedge[u]:
+				continue
+			traced.append(self.polyedge(u, v))
+			for a, b in pairwise(traced[-1]):
+				visited.add((a, b))
+				visited.add((b, a))
+
+		# edit() dropped the polyedges with the topology
+		index.replace(removed, traced)
+		self._polyedge_data = polyedges
+		self._polyedge_index = index
+		return traced
 
 	def polyline(self, u, v):
 
@@ -140,77 +337,127 @@ class Kagome(Mesh):
 
 		return [[self.vertex_coordinates(vkey) for vkey in polyedge] for polyedge in self.polyedge_data]
 
-	def polyline_frames(self):
-		polylines_frames = []
-		for polyedge in self.polyedge_data:
-			polyline_frames = []
-			for i, u in enumerate(polyedge):
-				#if end
-				if i == len(polyedge) - 1:
-					# if closed
-					if polyedge[0] == polyedge[-1]:
-						v = polyedge[1]
-					else:
-						v = polyedge[i - 1]
+	def polyedge_frames(self, polyedge):
+		polyline_frames = []
+		for i, u in enumerate(polyedge):
+			#if end
+			if i == len(polyedge) - 1:
+				# if closed
+				if polyedge[0] == polyedge[-1]:
+					v = polyedge[1]
 				else:
-					v = polyedge[i + 1]
-				x = self.vertex_normal(u)
-				y = normalize_vector(subtract_vectors(self.vertex_coordinates(v), self.vertex_coordinates(u)))
-				if i == len(polyedge) - 1 and polyedge[0] != polyedge[-1]:
-					y = scale_vector(y, -1)
-				z = cross_vectors(x, y)
-				polyline_frames.append([x, y, z])
-			polylines_frames.append(polyline_frames)
+					v = polyedge[i - 1]
+			else:
+				v = polyedge[i + 1]
+			x = self.vertex_normal(u)
+			y = normalize_vector(subtract_vectors(self.vertex_coordinates(v), self.vertex_coordinates(u)))
+			if i == len(polyedge) - 1 and polyedge[0] != polyedge[-1]:
+				y = scale_vector(y, -1)
+			z = cross_vectors(x, y)
+			polyline_frames.append([x, y, z])
+		return polyline_frames
+
+	def polyline_frames(self):
+		with stage('polyline_frames') as s:
+			polylines_frames = [self.polyedge_frames(polyedge) for polyedge in self.polyedge_data]
+			s.count(len(polylines_frames))
 		return polylines_frames
 
-	### weave ###
+	def polyline_frames_numpy(self):
+		from compas_kagome.frames import kagome_polyline_frames_numpy
+		with stage('polyline_frames_numpy') as s:
+			frames, offsets = kagome_polyline_frames_numpy(self)
+			s.count(len(offsets) - 1)
+		return frames, offsets
 
-	def polyedge_weaving(self):
+	### streams ###
+
+	def iter_polylines(self):
+		for polyedge in self.polyedge_data:
+			yield [self.vertex_coordinates(vkey) for vkey in polyedge]
+
+	def iter_polyline_frames(self):
+		for polyedge in self.polyedge_data:
+			yield self.polyedge_frames(polyedge)
+
+	def iter_polyedges(self, frames = True, weave = True, chunk_size = None):
 
-		edge_to_polyedge_index = {}
+		# (index, points, frames, weave) per polyedge, or lists of chunk_size of them
+		if weave:
+			# weaved once for all the polyedges, sliced per polyedge
+			polyedge_weave, offsets = self.polyedge_weaving_numpy()
+			polyedge_weave, offsets = polyedge_weave.tolist(), offsets.tolist()
+
+		chunk = []
 		for i, polyedge in enumerate(self.polyedge_data):
-			for u, v in pairwise(polyedge):
-				edge_to_polyedge_index[(u, v)] = i
-				edge_to_polyedge_index[(v, u)] = i
-
-		vertex_to_polyege_offset = {vkey: {} for vkey in self.vertices()}
-		for fkey in self.faces():
-			if len(self.face_vertices(fkey)) == 3:
-				for u, v, w in window(self.face_vertices(fkey) + self.face_vertices(fkey)[:2], n = 3):
-					vertex_to_polyege_offset[v].update({edge_to_polyedge_index[(u, v)]: +1, edge_to_polyedge_index[(v, w)]: -1})
+			item = (
+				i,
+				[self.vertex_coordinates(vkey) for vkey in polyedge],
+				self.polyedge_frames(polyedge) if frames else None,
+				polyedge_weave[offsets[i]: offsets[i + 1]] if weave else None,
+				)
+			if chunk_size is None:
+				yield item
 			else:
-				for u, v, w in window(self.face_vertices(fkey) + self.face_vertices(fkey)[:2], n = 3):
-					vertex_to_polyege_offset[v].update({edge_to_polyedge_index[(u, v)]: -1, edge_to_polyedge_index[(v, w)]: +1})
+				chunk.append(item)
+				if len(chunk) == chunk_size:
+					yield chunk
+					chunk = []
+		if chunk:
+			yield chunk
 
-		polyedge_weave = []
-		for i, polyedge in enumerate(self.polyedge_data):
-			polyedge_weave.append([vertex_to_polyege_offset[vkey][i] for vkey in polyedge])
+	### weave ###
+
+	def polyedge_weaving(self):
+
+		with stage('weaving') as s:
+			edge_to_polyedge_index = self.polyedge_index().edge_polyedge
+
+			vertex_to_polyege_offset = {vkey: {} for vkey in self.vertices()}
+			for fkey in self.faces():
+				if len(self.face_vertices(fkey)) == 3:
+					for u, v, w in window(self.face_vertices(fkey) + self.face_vertices(fkey)[:2], n = 3):
+						vertex_to_polyege_offset[v].update({edge_to_polyedge_index[(u, v)]: +1, edge_to_polyedge_index[(v, w)]: -1})
+				else:
+					for u, v, w in window(self.face_vertices(fkey) + self.face_vertices(fkey)[:2], n = 3):
+						vertex_to_polyege_offset[v].update({edge_to_polyedge_index[(u, v)]: -1, edge_to_polyedge_index[(v, w)]: +1})
+
+			polyedge_weave = []
+			for i, polyedge in enumerate(self.polyedge_data):
+				polyedge_weave.append([vertex_to_polyege_offset[vkey][i] for vkey in polyedge])
+
+			s.count(len(polyedge_weave))
 
 		return polyedge_weave
 
-		polyedges = kagome.polyedge_data
+	def polyedge_weaving_numpy(self):
+		from compas_kagome.weaving import kagome_polyedge_weaving_numpy
+		with stage('weaving_numpy') as s:
+			weave, offsets = kagome_polyedge_weaving_numpy(self)
+			s.count(len(offsets) - 1)
+		return weave, offsets
 
-	def polyedge_graph(self):
+	def polyedge_weaving_violations(self):
+		# vertex keys where the crossing polyedges do not have opposite offsets, and where faces disagree on an offset
+		from compas_kagome.weaving import kagome_weaving_violations_numpy
+		return kagome_weaving_violations_numpy(self)
+
+	def polyedge_adjacency(self):
 
-		polyedges = self.polyedge_data
+		with stage('polyedge_crossings') as s:
+			crossings = kagome_polyedge_crossings(self)
+			s.count(len(crossings))
 
-		edge_to_polyedge_index = {vkey: {} for vkey in self.vertices()}
-		for i, polyedge in enumerate(polyedges):
-			for u, v in pairwise(polyedge):
-				edge_to_polyedge_index[u][v] = i
-				edge_to_polyedge_index[v][u] = i
+		return crossings_to_csr(crossings, len(self.polyedge_data))
 
-		vertices = [centroid_points([self.vertex_coordinates(vkey) for vkey in polyedge]) for polyedge in polyedges]
+	def polyedge_graph(self):
 
-		edges = []
-		for idx, polyedge in enumerate(polyedges):
-			for vkey in polyedge:
-				for vkey_2 in self.vertex_neighbors(vkey):
-					idx_2 = edge_to_polyedge_index[vkey][vkey_2]
-					if idx_2 != idx and idx < idx_2 and (idx, idx_2) not in edges:
-						edges.append((idx, idx_2))
+		with stage('polyedge_graph') as s:
+			vertices = [centroid_points([self.vertex_coordinates(vkey) for vkey in polyedge]) for polyedge in self.polyedge_data]
+			network = Network.from_nodes_and_edges(vertices, kagome_polyedge_crossings(self))
+			s.count(len(vertices))
 
-		return Network.from_nodes_and_edges(vertices, edges)
+		return network
 
 # ==============================================================================
 # Main
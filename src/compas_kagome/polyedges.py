@@ -0,0 +1,377 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+
+from compas.utilities import pairwise
+
+
+__all__ = [
+	'PolyedgeIndex',
+	'kagome_halfedge_opposites',
+	'kagome_halfedge_opposites_numpy',
+	'kagome_polyedge_crossings',
+	'crossings_to_csr',
+	'trace_polyedges',
+	'trace_polyedges_reference',
+	'trace_polyedges_parallel',
+	'trace_polyedge',
+	]
+
+
+### opposites ###
+
+def kagome_halfedge_opposites(kagome):
+
+	# halfedges numbered in the order of the edges, the twin of h is h ^ 1
+	index = {}
+	origin = []
+	head = []
+	for u, v in kagome.edges():
+		index[(u, v)] = len(origin)
+		origin.append(u)
+		head.append(v)
+		index[(v, u)] = len(origin)
+		origin.append(v)
+		head.append(u)
+
+	twin = [h ^ 1 for h in range(len(origin))]
+
+	# next halfedge accross the head vertex, -1 at the extremities
+	opposite = [-1] * len(origin)
+	for v in kagome.vertices():
+		nbrs = kagome.vertex_neighbors(v, ordered=True)
+
+		if len(nbrs) == 4:
+			for i, u in enumerate(nbrs):
+				opposite[index[(u, v)]] = index[(v, nbrs[i - 2])]
+
+		elif len(nbrs) == 3:
+			for u in nbrs:
+				if kagome.is_edge_on_boundary(u, v):
+					for nbr in nbrs:
+						if nbr != u and kagome.is_edge_on_boundary(v, nbr):
+							opposite[index[(u, v)]] = index[(v, nbr)]
+							break
+
+	return origin, twin, head, opposite
+
+
+def kagome_halfedge_opposites_numpy(kagome):
+
+	# the same table from the halfedge arrays of a compact kagome, on vertex indices, with the halfedges of kagome.edges() as seeds
+	import numpy as np
+	from compas_kagome.compact import CompactKagome
+	from compas_kagome.compact import faces_to_csr
+
+	key_index = kagome.key_index()
+	n = len(key_index)
+	faces = [[key_index[vkey] for vkey in face] for face in kagome.face.values()]
+	# coordinates play no part in the topology
+	compact = CompactKagome(np.zeros((n, 3)), *faces_to_csr(faces))
+	origin = compact.halfedge_vertex
+	head = compact.halfedge_head()
+
+	# kagome.edges() yields each edge as the first of its halfedges in the halfedge dicts
+	halfedges = np.fromiter((key_index[w] for u, nbrs in kagome.halfedge.items() for v in nbrs for w in (u, v)), dtype=np.int64).reshape(-1, 2)
+	_, first = np.unique(halfedges.min(axis=1) * n + halfedges.max(axis=1), return_index=True)
+	edges = halfedges[np.sort(first)]
+
+	keys = origin.astype(np.int64) * n + head
+	order = np.argsort(keys)
+	seeds = order[np.searchsorted(keys[order], edges[:, 0] * n + edges[:, 1])]
+
+	return origin.tolist(), compact.halfedge_twin.tolist(), head.tolist(), compact.halfedge_opposite().tolist(), seeds.tolist()
+
+
+### tracing ###
+
+def trace_polyedges_reference(kagome):
+
+	# previous implementation, tracing each polyedge with vertex_opposite_vertex, kept to check and benchmark the engine against
+	polyedges = []
+	edge_visited = {(u, v): False for u, v in kagome.edges()}
+	for edge in kagome.edges():
+		if edge_visited[edge]:
+			continue
+		polyedges.append(kagome.polyedge(*edge))
+		for u, v in pairwise(polyedges[-1]):
+			edge_visited[(u, v)] = True
+			edge_visited[(v, u)] = True
+	return polyedges
+
+
+def trace_polyedges(seeds, origin, twin, head, opposite, n):
+
+	visited = bytearray(len(origin))
+	polyedges = []
+
+	for h0 in seeds:
+		if visited[h0]:
+			continue
+		polyedge, halfedges = trace_polyedge(h0, origin, twin, head, opposite, n)
+		polyedges.append(polyedge)
+		for h in halfedges:
+			visited[h] = 1
+			visited[twin[h]] = 1
+
+	return polyedges
+
+
+### parallel tracing ###
+
+# topology shared with the worker processes, set by the pool initializer
+_shared = {}
+
+
+def _shared_view(shared):
+	return memoryview(shared).cast('B').cast('i')
+
+
+def _shared_array(values):
+	from array import array
+	from multiprocessing.sharedctypes import RawArray
+	shared = RawArray('i', len(values))
+	_shared_view(shared)[:] = array('i', values)
+	return shared
+
+
+def _init_tracing(origin, twin, head, opposite, seeds, rank, n):
+	_shared.update(
+		origin=_shared_view(origin),
+		twin=_shared_view(twin),
+		head=_shared_view(head),
+		opposite=_shared_view(opposite),
+		seeds=_shared_view(seeds),
+		rank=_shared_view(rank),
+		n=n,
+		)
+
+
+def _is_first_seed(i, h0, twin, opposite, rank, n, seen):
+
+	# walks both ways from h0, one step at a time, until an earlier or already seen seed, or both extremities
+	h0_twin = twin[h0]
+	forward, backward = h0, h0_twin
+	walked = [h0]
+	first = True
+	for _ in range(n):
+		if forward >= 0:
+			forward = opposite[forward]
+			if forward == h0:
+				break
+			if forward >= 0:
+				if seen[forward] or rank[forward] < i:
+					first = False
+					break
+				walked.append(forward)
+		if backward >= 0:
+			backward = opposite[backward]
+			if backward == h0_twin:
+				break
+			if backward >= 0:
+				if seen[backward] or rank[backward] < i:
+					first = False
+					break
+				walked.append(backward)
+		if forward < 0 and backward < 0:
+			break
+	if not first:
+		# the polyedge is kept by an earlier chunk, its other seeds here can be skipped
+		for h in walked:
+			seen[h] = 1
+			seen[twin[h]] = 1
+	return first
+
+
+def _trace_polyedges_chunk(bounds):
+
+	# a polyedge is traced only from the first of its seeds, where the serial tracer starts it
+	origin, twin, head, opposite = _shared['origin'], _shared['twin'], _shared['head'], _shared['opposite']
+	seeds, rank, n = _shared['seeds'], _shared['rank'], _shared['n']
+	seen = bytearray(len(origin))
+	polyedges = []
+	for i in range(*bounds):
+		h0 = seeds[i]
+		if seen[h0] or not _is_first_seed(i, h0, twin, opposite, rank, n, seen):
+			continue
+		polyedge, halfedges = trace_polyedge(h0, origin, twin, head, opposite, n)
+		polyedges.append(polyedge)
+		for h in halfedges:
+			seen[h] = 1
+			seen[twin[h]] = 1
+	return polyedges
+
+
+def trace_polyedges_parallel(seeds, origin, twin, head, opposite, n, processes=None, chunks=None):
+
+	# same polyedges in the same order as trace_polyedges, the seeds being split across a pool of processes
+	from multiprocessing import Pool
+	from multiprocessing import cpu_count
+
+	seeds = list(seeds)
+	rank = [len(seeds)] * len(origin)
+	for i, h in enumerate(seeds):
+		rank[h] = i
+		rank[twin[h]] = i
+
+	if processes is None:
+		processes = cpu_count()
+	if chunks is None:
+		chunks = processes
+
+	pool = Pool(processes, _init_tracing, tuple(_shared_array(values) for values in (origin, twin, head, opposite, seeds, rank)) + (n,))
+	try:
+		size = max(1, -(-len(seeds) // chunks))
+		results = pool.map(_trace_polyedges_chunk, [(i, min(i + size, len(seeds))) for i in range(0, len(seeds), size)])
+	finally:
+		pool.close()
+		pool.join()
+
+	return [polyedge for result in results for polyedge in result]
+
+
+def trace_polyedge(h0, origin, twin, head, opposite, n):
+
+	u0 = origin[h0]
+	polyedge = [u0, head[h0]]
+	halfedges = [h0]
+
+	# forward until closed loop or first extremity
+	h = h0
+	while len(polyedge) <= n:
+		if polyedge[-1] == u0:
+			return polyedge, halfedges
+		g = opposite[h]
+		if g < 0:
+			break
+		polyedge.append(head[g])
+		halfedges.append(g)
+		h = g
+	else:
+		return polyedge, halfedges
+
+	# backward from the start until second extremity
+	end = polyedge[-1]
+	h = opposite[twin[h0]]
+	if h < 0:
+		return polyedge[::-1], halfedges
+	backward = [head[h]]
+	halfedges.append(h)
+	while len(polyedge) + len(backward) <= n:
+		if backward[-1] == end:
+			break
+		g = opposite[h]
+		if g < 0:
+			return backward[::-1] + polyedge, halfedges
+		backward.append(head[g])
+		halfedges.append(g)
+		h = g
+
+	return polyedge[::-1] + backward, halfedges
+
+
+### index ###
+
+class PolyedgeIndex(object):
+
+	def __init__(self, polyedges):
+		self.polyedges = polyedges
+		# both orientations of an edge map to the last polyedge through it
+		self.edge_polyedge = {}
+		self.edge_position = {}
+		self.vertex_polyedges = {}
+		for i in range(len(polyedges)):
+			self.add(i)
+
+	def add(self, i):
+		polyedge = self.polyedges[i]
+		for j, (u, v) in enumerate(pairwise(polyedge)):
+			self.edge_polyedge[(u, v)] = i
+			self.edge_polyedge[(v, u)] = i
+			self.edge_position[(u, v)] = j
+			self.edge_position[(v, u)] = j
+		for vkey in polyedge:
+			indices = self.vertex_polyedges.setdefault(vkey, [])
+			if i not in indices:
+				indices.append(i)
+
+	def remove(self, i):
+		polyedge = self.polyedges[i]
+		for u, v in pairwise(polyedge):
+			for edge in ((u, v), (v, u)):
+				if self.edge_polyedge.get(edge) == i:
+					del self.edge_polyedge[edge]
+					del self.edge_position[edge]
+		for vkey in set(polyedge):
+			indices = self.vertex_polyedges[vkey]
+			indices.remove(i)
+			if not indices:
+				del self.vertex_polyedges[vkey]
+
+	def replace(self, removed, polyedges):
+
+		# polyedges removed and added in place, the new ones taking the ids of the removed ones,
+		# and the last polyedges filling the ids left over, so that the ids stay contiguous
+		removed = sorted(set(removed))
+		for i in removed:
+			self.remove(i)
+		for i, polyedge in zip(removed, polyedges):
+			self.polyedges[i] = polyedge
+			self.add(i)
+		for polyedge in polyedges[len(removed):]:
+			self.polyedges.append(polyedge)
+			self.add(len(self.polyedges) - 1)
+		free = set(removed[len(polyedges):])
+		for i in sorted(free, reverse=True):
+			last = len(self.polyedges) - 1
+			if last != i:
+				self.remove(last)
+				self.polyedges[i] = self.polyedges[last]
+				self.add(i)
+			self.polyedges.pop()
+
+
+### crossings ###
+
+def kagome_polyedge_crossings(kagome):
+
+	# pairs of polyedges meeting at a vertex, in order of discovery
+	edge_polyedge = kagome.polyedge_index().edge_polyedge
+	seen = set()
+	crossings = []
+	for idx, polyedge in enumerate(kagome.polyedge_data):
+		for vkey in polyedge:
+			for nbr in kagome.vertex_neighbors(vkey):
+				idx_2 = edge_polyedge[(vkey, nbr)]
+				if idx < idx_2 and (idx, idx_2) not in seen:
+					seen.add((idx, idx_2))
+					crossings.append((idx, idx_2))
+	return crossings
+
+
+def crossings_to_csr(crossings, n):
+
+	# symmetric sparse adjacency of the polyedges as offsets and indices
+	offsets = [0] * (n + 1)
+	for u, v in crossings:
+		offsets[u + 1] += 1
+		offsets[v + 1] += 1
+	for i in range(n):
+		offsets[i + 1] += offsets[i]
+	fill = offsets[:-1]
+	indices = [0] * offsets[-1]
+	for u, v in crossings:
+		indices[fill[u]] = v
+		fill[u] += 1
+		indices[fill[v]] = u
+		fill[v] += 1
+	return offsets, indices
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+	pass
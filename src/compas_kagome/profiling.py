@@ -0,0 +1,135 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import json
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+__all__ = [
+	'Stats',
+	'profile',
+	'stage',
+	'add_hook',
+	'remove_hook',
+	]
+
+
+# callbacks receiving (name, seconds, elements) at the end of each stage, empty unless profiling
+_hooks = []
+
+# stages being timed, innermost last
+_stack = []
+
+
+class Stats(object):
+
+	# exclusive wall time, number of calls and number of elements per stage, in order of first call
+	def __init__(self):
+		self.stages = OrderedDict()
+
+	def record(self, name, seconds, elements=0):
+		if name not in self.stages:
+			self.stages[name] = {'calls': 0, 'seconds': 0., 'elements': 0}
+		entry = self.stages[name]
+		entry['calls'] += 1
+		entry['seconds'] += seconds
+		entry['elements'] += elements
+
+	def __getitem__(self, name):
+		return self.stages[name]
+
+	def __contains__(self, name):
+		return name in self.stages
+
+	def total(self):
+		return sum(entry['seconds'] for entry in self.stages.values())
+
+	@property
+	def data(self):
+		return {'stages': [dict(name=name, **entry) for name, entry in self.stages.items()]}
+
+	def to_json(self, filepath=None):
+		if filepath is None:
+			return json.dumps(self.data, indent=4)
+		with open(filepath, 'w') as f:
+			json.dump(self.data, f, indent=4)
+
+	def __str__(self):
+		lines = ['{:<28} {:>6} {:>10} {:>10}'.format('stage', 'calls', 'seconds', 'elements')]
+		for name, entry in self.stages.items():
+			lines.append('{:<28} {:>6} {:>10.4f} {:>10}'.format(name, entry['calls'], entry['seconds'], entry['elements']))
+		return '\n'.join(lines)
+
+
+class _Stage(object):
+
+	def __init__(self):
+		self.elements = 0
+		self.nested = 0.
+
+	def count(self, elements):
+		self.elements += elements
+
+
+class _NoStage(object):
+
+	def count(self, elements):
+		pass
+
+
+_no_stage = _NoStage()
+
+
+def add_hook(hook):
+	_hooks.append(hook)
+
+
+def remove_hook(hook):
+	_hooks.remove(hook)
+
+
+@contextmanager
+def stage(name):
+
+	# times the enclosed block if anything is listening, the stage counts its elements with count()
+	# the time of nested stages is only reported for them, so that the times of all stages add up
+	if not _hooks:
+		yield _no_stage
+		return
+	record = _Stage()
+	_stack.append(record)
+	t0 = time.time()
+	try:
+		yield record
+	finally:
+		seconds = time.time() - t0
+		_stack.pop()
+		if _stack:
+			_stack[-1].nested += seconds
+		for hook in list(_hooks):
+			hook(name, seconds - record.nested, record.elements)
+
+
+@contextmanager
+def profile(stats=None):
+
+	# collects the stages run within the block
+	if stats is None:
+		stats = Stats()
+	add_hook(stats.record)
+	try:
+		yield stats
+	finally:
+		remove_hook(stats.record)
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+	pass
@@ -0,0 +1,82 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import hashlib
+
+from collections import OrderedDict
+
+
+__all__ = ['SubdivisionPyramid']
+
+
+class SubdivisionPyramid(object):
+
+	# bounded LRU cache of the subdivision levels of coarse meshes, keyed by their content and options, the size being counted in faces
+	def __init__(self, maxfaces=2 ** 21):
+		self.maxfaces = maxfaces
+		self.levels = OrderedDict()
+		self.faces = 0
+		self.hits = 0
+		self.misses = 0
+
+	def signature(self, vertices, faces, *options):
+		content = repr(([[float(x) for x in xyz] for xyz in vertices], [[int(i) for i in face] for face in faces], options))
+		return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+	def get(self, key, k):
+		entry = self.levels.pop((key, k), None)
+		if entry is None:
+			return None
+		self.levels[(key, k)] = entry
+		return entry[0]
+
+	def put(self, key, k, level, size):
+		entry = self.levels.pop((key, k), None)
+		if entry is not None:
+			self.faces -= entry[1]
+		self.levels[(key, k)] = (level, size)
+		self.faces += size
+		# the level just added is kept even if it alone exceeds the budget
+		while self.faces > self.maxfaces and len(self.levels) > 1:
+			_, (_, size) = self.levels.popitem(last=False)
+			self.faces -= size
+
+	def subdivide(self, key, coarse, k, subdivide_once, size):
+
+		# deepest cached level up to k, then one subdivision per missing level, each of them cached
+		j = k
+		level = None
+		while j > 0:
+			level = self.get(key, j)
+			if level is not None:
+				break
+			j -= 1
+		if j == k:
+			self.hits += 1
+		else:
+			self.misses += 1
+		if j == 0:
+			level = coarse
+		for i in range(j + 1, k + 1):
+			level = subdivide_once(level)
+			self.put(key, i, level, size(level))
+		return level
+
+	def clear(self):
+		self.levels.clear()
+		self.faces = 0
+		self.hits = 0
+		self.misses = 0
+
+
+# shared by the numpy kagome pipeline when no pyramid is given, so that sweeping k over the same coarse mesh reuses its levels
+DEFAULT_PYRAMID = SubdivisionPyramid(maxfaces=2 ** 20)
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+	pass
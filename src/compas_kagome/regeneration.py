@@ -0,0 +1,173 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import numpy as np
+
+from compas_kagome.kagome import Kagome
+from compas_kagome.profiling import stage
+from compas_kagome.subdivision import kagome_labels_numpy
+from compas_kagome.subdivision import kagome_operator_numpy
+from compas_kagome.subdivision import kagome_vertices_and_faces_numpy
+
+
+__all__ = ['KagomeRegenerator']
+
+
+class KagomeRegenerator(object):
+
+	# kagome of a coarse mesh kept in sync with its edits: moved vertices only update the kagome vertices in their subdivision support,
+	# changes of the coarse topology (added, deleted or re-connected vertices and faces) only replace the kagome faces that changed,
+	# found by their barycentric labels on the coarse faces, and retrace the polyedges through them, the kagome staying the same object
+	def __init__(self, coarse_mesh, k=1, fixed_boundary=True, cls=Kagome):
+		self.k = k
+		self.fixed_boundary = fixed_boundary
+		self.cls = cls
+		self.rebuild(coarse_mesh)
+
+	def _topology(self, coarse_mesh):
+		keys = list(coarse_mesh.vertices())
+		key_index = {key: i for i, key in enumerate(keys)}
+		faces = [[key_index[vkey] for vkey in coarse_mesh.face_vertices(fkey)] for fkey in coarse_mesh.faces()]
+		return keys, key_index, faces
+
+	def _fixed(self, coarse_mesh, key_index):
+		return [key_index[vkey] for vkey in coarse_mesh.vertices_on_boundary()] if self.fixed_boundary else None
+
+	def _labels(self, keys, faces):
+		# one row of (coarse key, weight) pairs per kagome vertex, sorted by key and padded, independent of the coarse vertex order
+		labels = kagome_labels_numpy(faces, len(keys), self.k)
+		columns = np.array(keys, dtype=np.int64)[labels.indices]
+		rows = np.repeat(np.arange(labels.shape[0]), np.diff(labels.indptr))
+		order = np.lexsort((columns, rows))
+		position = np.arange(len(order)) - labels.indptr[rows]
+		padded = np.full((labels.shape[0], 6), -1, dtype=np.int64)
+		padded[rows, 2 * position] = columns[order]
+		padded[rows, 2 * position + 1] = labels.data[order]
+		return padded
+
+	def _face_table(self):
+		# kagome faces by their vertices, rotated to start at the smallest key
+		table = {}
+		for fkey in self.kagome.faces():
+			vertices = self.kagome.face_vertices(fkey)
+			i = vertices.index(min(vertices))
+			table[tuple(vertices[i:] + vertices[:i])] = fkey
+		return table
+
+	def rebuild(self, coarse_mesh):
+		self.keys, key_index, self.faces = self._topology(coarse_mesh)
+		self.xyz = np.array([coarse_mesh.vertex_coordinates(vkey) for vkey in self.keys], dtype=np.float64)
+		fixed = self._fixed(coarse_mesh, key_index)
+		self.kagome = self.cls.from_mesh_numpy(coarse_mesh, self.k, self.fixed_boundary)
+		self.vertex_keys = list(self.kagome.vertices())
+		self.labels = self._labels(self.keys, self.faces)
+		self.face_table = self._face_table()
+		# rows to evaluate the kagome vertices, columns to find those depending on a coarse vertex
+		self.operator = kagome_operator_numpy(self.xyz, self.faces, self.k, fixed)
+		self.support = self.operator.tocsc()
+
+	def update(self, coarse_mesh, tol=0.):
+
+		# kagome vertex keys added or moved in place
+		keys, key_index, faces = self._topology(coarse_mesh)
+		xyz = np.array([coarse_mesh.vertex_coordinates(vkey) for vkey in keys], dtype=np.float64)
+		if keys != self.keys or faces != self.faces:
+			return self.retopologise(coarse_mesh, keys, key_index, faces, xyz, tol)
+
+		moved = np.flatnonzero(np.any(np.abs(xyz - self.xyz) > tol, axis=1))
+		if not len(moved):
+			return []
+		self.xyz[moved] = xyz[moved]
+
+		# rows are evaluated from all the coarse vertices, so that edits do not accumulate rounding errors
+		rows = np.unique(self.support[:, moved].indices)
+		updated = []
+		for row, (x, y, z) in zip(rows.tolist(), (self.operator[rows] @ self.xyz).tolist()):
+			vkey = self.vertex_keys[row]
+			attr = self.kagome.vertex[vkey]
+			attr['x'], attr['y'], attr['z'] = x, y, z
+			updated.append(vkey)
+		return updated
+
+	def retopologise(self, coarse_mesh, keys, key_index, faces, xyz, tol=0.):
+
+		# kagome vertex keys added or moved in place after a change of the coarse topology
+		fixed = self._fixed(coarse_mesh, key_index)
+		kagome_xyz, offsets, indices = kagome_vertices_and_faces_numpy(xyz, faces, self.k, fixed, pyramid=False)
+		operator = kagome_operator_numpy(xyz, faces, self.k, fixed)
+		labels = self._labels(keys, faces)
+
+		# kagome vertices with the same label are kept, with their old row
+		_, inverse = np.unique(np.vstack((self.labels, labels)), axis=0, return_inverse=True)
+		inverse = inverse.ravel()
+		lookup = np.full(inverse.max() + 1, -1, dtype=np.int64)
+		lookup[inverse[:len(self.labels)]] = np.arange(len(self.labels))
+		match = lookup[inverse[len(self.labels):]]
+		old_xyz = self.operator @ self.xyz
+		kept = np.flatnonzero(match >= 0)
+		moved = kept[np.any(np.abs(kagome_xyz[kept] - old_xyz[match[kept]]) > tol, axis=1)]
+		removed_vertices = [self.vertex_keys[row] for row in np.setdiff1d(np.arange(len(self.labels)), match[kept]).tolist()]
+
+		# kagome faces with the same kept vertices are kept
+		vertex_keys = [self.vertex_keys[row] if row >= 0 else None for row in match.tolist()]
+		indices = indices.tolist()
+		offsets = offsets.tolist()
+		face_table = {}
+		added_faces = []
+		for i, j in zip(offsets[:-1], offsets[1:]):
+			face = indices[i: j]
+			vertices = [vertex_keys[row] for row in face]
+			if None not in vertices:
+				r = vertices.index(min(vertices))
+				rotated = tuple(vertices[r:] + vertices[:r])
+				if rotated in self.face_table:
+					face_table[rotated] = self.face_table[rotated]
+					continue
+			added_faces.append(face)
+		kept_faces = set(face_table.values())
+		removed_faces = [fkey for fkey in self.face_table.values() if fkey not in kept_faces]
+		reconnected = set(vertex_keys[row] for face in added_faces for row in face) - {None}
+		kagome = self.kagome
+		touched = set(vkey for fkey in removed_faces for vkey in kagome.face_vertices(fkey)) | reconnected
+
+		def edit():
+			for fkey in removed_faces:
+				kagome.delete_face(fkey)
+			for vkey in removed_vertices:
+				kagome.delete_vertex(vkey)
+			added = []
+			for row in np.flatnonzero(match < 0).tolist():
+				x, y, z = kagome_xyz[row].tolist()
+				vertex_keys[row] = kagome.add_vertex(x=x, y=y, z=z)
+				added.append(vertex_keys[row])
+			for face in added_faces:
+				vertices = [vertex_keys[row] for row in face]
+				r = vertices.index(min(vertices))
+				face_table[tuple(vertices[r:] + vertices[:r])] = kagome.add_face(vertices)
+			return added + sorted(reconnected)
+
+		with stage('kagome_retopology') as s:
+			kagome.patch_polyedges(touched, edit)
+			s.count(len(added_faces))
+		updated = [vertex_keys[row] for row in np.flatnonzero(match < 0).tolist()]
+		for row, (x, y, z) in zip(moved.tolist(), kagome_xyz[moved].tolist()):
+			attr = kagome.vertex[vertex_keys[row]]
+			attr['x'], attr['y'], attr['z'] = x, y, z
+			updated.append(vertex_keys[row])
+
+		self.keys, self.faces, self.xyz = keys, faces, xyz
+		self.vertex_keys = vertex_keys
+		self.labels = labels
+		self.face_table = face_table
+		self.operator = operator
+		self.support = operator.tocsc()
+		return updated
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+	pass
@@ -0,0 +1,86 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+
+__all__ = [
+	'FaceDegreeIndex'
+	]
+
+
+class FaceDegreeIndex(object):
+
+	def __init__(self, mesh):
+		# face degrees and, per face, the number of neighbours, tri neighbours and hex neighbours
+		self.degree = {fkey: len(mesh.face_vertices(fkey)) for fkey in mesh.faces()}
+		self.counts = {fkey: self.neighbor_counts(mesh.face_neighbors(fkey)) for fkey in self.degree}
+		# live sets of singular faces, as ordered dicts
+		self.singular = {}
+		self.negative = {}
+		for fkey in self.degree:
+			self.classify(fkey)
+
+	def neighbor_counts(self, nbrs):
+		degrees = [self.degree[nbr] for nbr in nbrs]
+		return len(degrees), degrees.count(3), degrees.count(6)
+
+	### faces ###
+
+	def hex_faces(self):
+		return [fkey for fkey, degree in self.degree.items() if degree == 6]
+
+	def tri_faces(self):
+		return [fkey for fkey, degree in self.degree.items() if degree == 3]
+
+	### singularities ###
+
+	def is_singular(self, fkey):
+		degree = self.degree[fkey]
+		count, tri, hexa = self.counts[fkey]
+		return (tri == count and degree != 6) or (hexa == count and degree != 3)
+
+	def is_negative_singular(self, fkey):
+		count, tri, _ = self.counts[fkey]
+		return tri == count and self.degree[fkey] > 6
+
+	def classify(self, fkey):
+		if self.is_singular(fkey):
+			self.singular[fkey] = None
+		else:
+			self.singular.pop(fkey, None)
+		if self.is_negative_singular(fkey):
+			self.negative[fkey] = None
+		else:
+			self.negative.pop(fkey, None)
+
+	def singularities(self):
+		return list(self.singular)
+
+	def negative_singularities(self):
+		return list(self.negative)
+
+	### updates ###
+
+	def update(self, mesh, fkeys):
+		# refresh edited faces and their neighbours, dropping the faces that were deleted
+		fkeys = [fkey for fkey in set(fkeys)]
+		for fkey in fkeys:
+			if fkey in mesh.face:
+				self.degree[fkey] = len(mesh.face_vertices(fkey))
+			else:
+				self.degree.pop(fkey, None)
+				self.counts.pop(fkey, None)
+				self.singular.pop(fkey, None)
+				self.negative.pop(fkey, None)
+		for fkey in fkeys:
+			if fkey in mesh.face:
+				self.counts[fkey] = self.neighbor_counts(mesh.face_neighbors(fkey))
+				self.classify(fkey)
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+	pass
@@ -4,10 +4,11 @@ from __future__ import division
 
 from math import floor
 
+from collections import OrderedDict
+
 from compas.datastructures import Network
-from compas.geometry import Polyline
 
-from compas.geometry import convex_hull, discrete_coons_patch
+from compas.geometry import convex_hull
 
 from compas.geometry import add_vectors
 from compas.geometry import subtract_vectors
@@ -15,105 +16,269 @@ from compas.geometry import normalize_vector
 from compas.geometry import scale_vector
 from compas.geometry import distance_point_point
 from compas.geometry import midpoint_line
+from compas.geometry import dot_vectors
+from compas.geometry import cross_vectors
+from compas.geometry import transform_points
+from compas.geometry import Frame
+from compas.geometry import Transformation
 
-from compas.datastructures import mesh_unweld_vertices
 from compas.datastructures import meshes_join_and_weld
 
-from compas.datastructures import trimesh_subdivide_loop
-
 from compas.utilities import geometric_key
 
+from compas_kagome.profiling import stage
+
 
 __all__ = [
+	'JointCache',
+	'trimesh_skeleton_joint',
 	'trimesh_skeleton'
 	]
 
 
-def insert_triface_on_boundary(mesh, bdry_vkey, nbr_vkey):
+def insert_triface_on_boundary(mesh, bdry_vkey, nbr_vkey, geom_key_map=None):
 
-	# topology
-	fkey = mesh.halfedge[nbr_vkey][bdry_vkey]
-	faces = mesh.vertex_faces(bdry_vkey, ordered=True)
-	i = faces.index(fkey)
-	left_faces = faces[i:]
-	x, y, z = mesh.vertex_coordinates(bdry_vkey)
-	attr = {'x': x, 'y': y, 'z': z}
-	new_vkey = mesh.add_vertex(attr_dict=attr)
-	for face in left_faces:
-		new_vertices = [vkey if vkey != bdry_vkey else new_vkey for vkey in mesh.face_vertices(face)]
-		mesh.delete_face(face)
-		mesh.add_face(new_vertices, fkey=face)
+	return insert_trifaces_on_boundary(mesh, [(bdry_vkey, nbr_vkey)], geom_key_map)[0]
 
-	new_vkeys = [bdry_vkey, new_vkey]
 
-	# geometry
-	for vkey in new_vkeys:
-		for nbr in mesh.vertex_neighbors(vkey):
-			if mesh.is_edge_on_boundary(vkey, nbr) and nbr != nbr_vkey:
-				x, y, z = mesh.edge_point(vkey, nbr, t=.33)
-				mesh.vertex[vkey]['x'] = x
-				mesh.vertex[vkey]['y'] = y
-				mesh.vertex[vkey]['z'] = z
-				break
+def _boundary_fan(mesh, vkey, fkey):
 
-	# add new face
-	mesh.add_face([nbr_vkey] + new_vkeys)
+	# faces around a vertex from fkey to the boundary, as the end of its ordered vertex faces,
+	# but within a single fan where a vertex is shared by two boundaries
+	faces = []
+	while fkey is not None and fkey not in faces:
+		faces.append(fkey)
+		vertices = mesh.face_vertices(fkey)
+		fkey = mesh.halfedge[vertices[(vertices.index(vkey) + 1) % len(vertices)]][vkey]
+	return faces
 
-	return new_vkey
 
+def insert_trifaces_on_boundary(mesh, splits, geom_key_map=None):
 
-def trimesh_skeleton(cls, lines, radius=1):
+	# topology, planned for all splits before the faces are rebuilt
+	new_vkeys = []
+	gkeys = []
+	new_faces = {}
+	for bdry_vkey, nbr_vkey in splits:
+		fkey = mesh.halfedge[nbr_vkey][bdry_vkey]
+		left_faces = _boundary_fan(mesh, bdry_vkey, fkey)
+		x, y, z = mesh.vertex_coordinates(bdry_vkey)
+		gkeys.append(geometric_key([x, y, z]))
+		attr = {'x': x, 'y': y, 'z': z}
+		new_vkey = mesh.add_vertex(attr_dict=attr)
+		new_vkeys.append(new_vkey)
+		for face in left_faces:
+			vertices = new_faces.get(face, mesh.face_vertices(face))
+			new_faces[face] = [vkey if vkey != bdry_vkey else new_vkey for vkey in vertices]
 
-	network = Network.from_lines(lines)
+	for face, new_vertices in new_faces.items():
+		mesh.delete_face(face)
+		mesh.add_face(new_vertices, fkey=face)
+
+	# geometry
+	for (bdry_vkey, nbr_vkey), new_vkey in zip(splits, new_vkeys):
+		for vkey in [bdry_vkey, new_vkey]:
+			for nbr in mesh.vertex_neighbors(vkey):
+				if mesh.is_edge_on_boundary(vkey, nbr) and nbr != nbr_vkey:
+					x, y, z = mesh.edge_point(vkey, nbr, t=.33)
+					mesh.vertex[vkey]['x'] = x
+					mesh.vertex[vkey]['y'] = y
+					mesh.vertex[vkey]['z'] = z
+					break
+
+	# add new faces
+	for (bdry_vkey, nbr_vkey), new_vkey in zip(splits, new_vkeys):
+		mesh.add_face([nbr_vkey, bdry_vkey, new_vkey])
+
+	# spatial hash
+	if geom_key_map is not None:
+		for (bdry_vkey, nbr_vkey), new_vkey, gkey in zip(splits, new_vkeys, gkeys):
+			if geom_key_map.get(gkey) == bdry_vkey:
+				del geom_key_map[gkey]
+			for vkey in [bdry_vkey, new_vkey]:
+				geom_key_map[geometric_key(mesh.vertex_coordinates(vkey))] = vkey
+
+	return new_vkeys
+
+
+def trimesh_skeleton_joint(cls, xyz, points):
+
+	# joint of a node from the points at radius on its edges, as plain vertices and faces
+	idx_to_key = {i: key for i, key in enumerate(points)}
+	faces = convex_hull(list(points.values()))
+	faces = [[idx_to_key[idx] for idx in face] for face in faces]
+	mesh = cls.from_vertices_and_faces(points, faces)
+
+	meshes = []
+	
+	for fkey in mesh.faces():
+		vertices = [mesh.edge_midpoint(u, v) for u, v in mesh.face_halfedges(fkey)]
+		faces = [[0,1,2]]
+		meshes.append(cls.from_vertices_and_faces(vertices, faces))
 
 	tube_extremities = {}
+	for vkey_2 in mesh.vertices():
+		tops = []
+		bottoms = []
+		n = normalize_vector(subtract_vectors(mesh.vertex_coordinates(vkey_2), xyz))
+		for i in range(len(mesh.vertex_neighbors(vkey_2))):
+			pt_0 = mesh.edge_midpoint(vkey_2, mesh.vertex_neighbors(vkey_2, ordered = True)[i - 1])
+			bottoms.append(pt_0)
+			pt_1 = mesh.edge_midpoint(vkey_2, mesh.vertex_neighbors(vkey_2, ordered = True)[i])
+			pt_2 = midpoint_line([pt_0, pt_1])
+			pt_2 = add_vectors(scale_vector(n, distance_point_point(pt_0, pt_1)), pt_2)
+			tops.append(pt_2)
+			vertices = [pt_0, pt_2, pt_1]
+			faces = [[0,1,2]]
+			meshes.append(cls.from_vertices_and_faces(vertices, faces))
+		for i in range(len(tops)):
+			vertices = [tops[i - 1], tops[i], bottoms[i]]
+			faces = [[0,1,2]]
+			meshes.append(cls.from_vertices_and_faces(vertices, faces))
+
+		tube_extremities[vkey_2] = tops
+
+	joint = meshes_join_and_weld(meshes)
+
+	return mesh.to_vertices_and_faces(), joint.to_vertices_and_faces(), tube_extremities
+
+
+def _trimesh_skeleton_joint(args):
+
+	return trimesh_skeleton_joint(*args)
+
+
+class JointCache(object):
+
+	# bounded LRU cache of joint meshes built at the origin, keyed by the signature of their strut directions
+	def __init__(self, maxsize=128, precision=6):
+		self.maxsize = maxsize
+		self.precision = precision
+		self.templates = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def signature(self, directions, radius):
+		# invariant to rotations of the directions, but neither to reflections nor to their order
+		d0 = directions[0]
+		j = joint_frame_index(directions)
+		gram = [round(dot_vectors(a, b), self.precision) for i, a in enumerate(directions) for b in directions[i + 1:]]
+		chirality = [round(dot_vectors(cross_vectors(d0, directions[j]), dk), self.precision) for dk in directions]
+		return (len(directions), j, round(radius, self.precision), tuple(gram), tuple(chirality))
+
+	def get(self, key):
+		template = self.templates.pop(key, None)
+		if template is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self.templates[key] = template
+		return template
+
+	def put(self, key, template):
+		self.templates.pop(key, None)
+		self.templates[key] = template
+		while len(self.templates) > self.maxsize:
+			self.templates.popitem(last=False)
+
+	def clear(self):
+		self.templates.clear()
+		self.hits = 0
+		self.misses = 0
+
+
+def joint_frame_index(directions):
+
+	# second axis of the joint frame, the first direction not parallel to the first one
+	for j in range(1, len(directions)):
+		if abs(dot_vectors(directions[0], directions[j])) < 1 - 1e-3:
+			return j
+	return None
+
+
+def joint_instance(template, xyz, directions, keys):
+
+	# joint built at the origin moved onto a node with the same strut configuration
+	directions_0, (hull, joint, extremities) = template
+	j = joint_frame_index(directions)
+	frame_0 = Frame([0, 0, 0], directions_0[0], directions_0[j])
+	frame = Frame(xyz, directions[0], directions[j])
+	T = Transformation.from_frame_to_frame(frame_0, frame)
+	hull = (transform_points(hull[0], T), hull[1])
+	joint = (transform_points(joint[0], T), joint[1])
+	extremities = {keys[i]: transform_points(tops, T) for i, tops in extremities.items()}
+	return hull, joint, extremities
+
+
+def _trimesh_skeleton_joints(joints, processes=None):
+
+	if processes is not None and processes != 1 and len(joints) > 1:
+		from multiprocessing import Pool
+		pool = Pool(processes)
+		try:
+			return pool.map(_trimesh_skeleton_joint, joints)
+		finally:
+			pool.close()
+			pool.join()
+	return [trimesh_skeleton_joint(*args) for args in joints]
+
 
-	nodes = []
-	for vkey in network.nodes():
-		if len(network.adjacency[vkey]) > 1:
-			
-			points = {nbr: network.edge_point(vkey, nbr, t = float(radius) / network.edge_length(vkey, nbr)) for nbr in network.adjacency[vkey]}
-			idx_to_key = {i: key for i, key in enumerate(network.adjacency[vkey])}
-			faces = convex_hull(list(points.values()))
-			faces = [[idx_to_key[idx] for idx in face] for face in faces]
-			mesh = cls.from_vertices_and_faces(points, faces)
-			nodes.append(mesh)
-
-			meshes = []
-			
-			for fkey in mesh.faces():
-				vertices = [mesh.edge_midpoint(u, v) for u, v in mesh.face_halfedges(fkey)]
-				faces = [[0,1,2]]
-				meshes.append(cls.from_vertices_and_faces(vertices, faces))
-
-			for vkey_2 in mesh.vertices():
-				tops = []
-				bottoms = []
-				n = normalize_vector(subtract_vectors(mesh.vertex_coordinates(vkey_2), network.node_coordinates(vkey)))
-				for i in range(len(mesh.vertex_neighbors(vkey_2))):
-					pt_0 = mesh.edge_midpoint(vkey_2, mesh.vertex_neighbors(vkey_2, ordered = True)[i - 1])
-					bottoms.append(pt_0)
-					pt_1 = mesh.edge_midpoint(vkey_2, mesh.vertex_neighbors(vkey_2, ordered = True)[i])
-					pt_2 = midpoint_line([pt_0, pt_1])
-					pt_2 = add_vectors(scale_vector(n, distance_point_point(pt_0, pt_1)), pt_2)
-					tops.append(pt_2)
-					vertices = [pt_0, pt_2, pt_1]
-					faces = [[0,1,2]]
-					meshes.append(cls.from_vertices_and_faces(vertices, faces))
-				for i in range(len(tops)):
-					vertices = [tops[i - 1], tops[i], bottoms[i]]
-					faces = [[0,1,2]]
-					meshes.append(cls.from_vertices_and_faces(vertices, faces))
+def trimesh_skeleton(cls, lines, radius=1, processes=None, use_numpy=False, joint_cache=None):
 
-				tube_extremities[(vkey, vkey_2)] = tops
-					
-			mesh = meshes_join_and_weld(meshes)
+	network = Network.from_lines(lines)
 
-			nodes.append(mesh)
+	tube_extremities = {}
 
-	all_nodes = meshes_join_and_weld(nodes)
+	with stage('skeleton_joints') as s:
+		# joints are independent, so they can be built in a pool of processes
+		joints = []
+		for vkey in network.nodes():
+			if len(network.adjacency[vkey]) > 1:
+				points = {nbr: network.edge_point(vkey, nbr, t = float(radius) / network.edge_length(vkey, nbr)) for nbr in network.adjacency[vkey]}
+				joints.append((vkey, (cls, network.node_coordinates(vkey), points)))
+
+		if joint_cache is None:
+			results = _trimesh_skeleton_joints([args for vkey, args in joints], processes)
+		else:
+			# only one joint per strut configuration is built, the others are instanced
+			signatures = []
+			templates = {}
+			missing = []
+			for vkey, (cls, xyz, points) in joints:
+				directions = [normalize_vector(subtract_vectors(pt, xyz)) for pt in points.values()]
+				if joint_frame_index(directions) is None:
+					signatures.append(None)
+					continue
+				key = joint_cache.signature(directions, radius)
+				signatures.append(key)
+				if key not in templates:
+					templates[key] = joint_cache.get(key)
+					if templates[key] is None:
+						missing.append((key, directions))
+			built = _trimesh_skeleton_joints([(cls, [0, 0, 0], {i: scale_vector(d, radius) for i, d in enumerate(directions)}) for key, directions in missing], processes)
+			for (key, directions), result in zip(missing, built):
+				templates[key] = (directions, result)
+				joint_cache.put(key, templates[key])
+			results = []
+			for (vkey, (cls, xyz, points)), key in zip(joints, signatures):
+				if key is None:
+					results.append(trimesh_skeleton_joint(cls, xyz, points))
+				else:
+					directions = [normalize_vector(subtract_vectors(pt, xyz)) for pt in points.values()]
+					results.append(joint_instance(templates[key], xyz, directions, list(points)))
+
+		nodes = []
+		for (vkey, args), (hull, joint, extremities) in zip(joints, results):
+			nodes.append(cls.from_vertices_and_faces(*hull))
+			nodes.append(cls.from_vertices_and_faces(*joint))
+			for vkey_2, tops in extremities.items():
+				tube_extremities[(vkey, vkey_2)] = tops
+		s.count(len(joints))
+
+	with stage('skeleton_join') as s:
+		all_nodes = meshes_join_and_weld(nodes)
+		s.count(all_nodes.number_of_faces())
 
-	
 	# leaf node ring
 	for u in network.nodes():
 		if len(network.adjacency[u]) == 1:
@@ -122,71 +287,192 @@ def trimesh_skeleton(cls, lines, radius=1):
 			ring_u = [add_vectors(pt, network.edge_vector(v, u)) for pt in ring_v[::-1]]
 			tube_extremities[(u, v)] = ring_u
 
-	beams = []
-	for u, v in network.edges():
-
+	with stage('skeleton_resolution') as s:
+		# spatial hash of the joint vertices, kept up to date by the boundary insertions
 		geom_key_map = {geometric_key(all_nodes.vertex_coordinates(vkey)): vkey for vkey in all_nodes.vertices()}
-		if len(tube_extremities[(u, v)]) != len(tube_extremities[(v, u)]):
-			if len(tube_extremities[(u, v)]) < len(tube_extremities[(v, u)]):
-				a, b = u, v
-			else:
-				a, b = v, u
-			n = len(tube_extremities[(b, a)]) - len(tube_extremities[(a, b)])
-			for i in range(n):
-				bdry_vkey = geom_key_map[geometric_key(tube_extremities[(a, b)][0])]
-				nbr_vkey = None
-				for nbr in all_nodes.vertex_neighbors(bdry_vkey):
-					if not all_nodes.is_edge_on_boundary(bdry_vkey, nbr):
-						nbr_vkey = nbr
-				k = tube_extremities[(a, b)].index(all_nodes.vertex_coordinates(bdry_vkey))
-				new_vkey = insert_triface_on_boundary(all_nodes, bdry_vkey, nbr_vkey)
-				tube_extremities[(a, b)].insert(k + 1 - len(tube_extremities[(a, b)]), all_nodes.vertex_coordinates(new_vkey))
-
-		if len(tube_extremities[(u, v)]) == len(tube_extremities[(v, u)]):
-			n = len(tube_extremities[(u, v)])
-			l = network.edge_length(u, v) - 2 * radius
-			m = (floor(l / radius) + 1) * 2
-			pt_uv = tube_extremities[(u, v)]
-			pt_vu = list(reversed(tube_extremities[(v, u)]))
-			dmin = -1
-			imin = None
-			for i in range(n):
-				distance = sum([distance_point_point(pt_uv[j], pt_vu[i + j - len(pt_vu)]) for j in range(n)])
-				if dmin < 0 or distance < dmin:
-					dmin = distance
-					imin = i
-			pt_vu = [pt_vu[imin + j - len(pt_vu)] for j in range(n)]
-			
-			# ab = pt_uv# + pt_uv[0:]
-			# dc = pt_vu# + pt_vu[0:]
-			# line = Polyline([ab[0], dc[0]])
-			# ad = [line.point(i / (m - 1)) for i in range(m)]
-			# bc = ad
-			# vertices, faces = discrete_coons_patch(ab, bc, dc, ad)
-			# tri_faces = []
-			# for (a, b, c, d) in faces:
-			# 	tri_faces += [[a, b, c], [a, c, d]] # reverse?
-			# beams.append(Mesh.from_vertices_and_faces(vertices, tri_faces))
-			
-			array = [pt_uv]
-			for i in range(int(m)):
-				polygon = []
-				for j in range(int(n)):
-					u = pt_uv[j]
-					v = pt_vu[j]
-					polygon.append(add_vectors(scale_vector(u, (float(m) - 1 - float(i))/float(m - 1)), scale_vector(v, float(i)/float(m - 1))))
-				array.append(polygon)
-			array.append(pt_vu)
-			for i in range(1, int(m + 2)):
-				for j in range(int(n)):
-					vertices = [array[i - 1][j - 1], array[i - 1][j], array[i][j - 1], array[i][j]] # create staggered pattern?
-					faces = [[3, 1, 0], [2, 3, 0]]
-					beams.append(cls.from_vertices_and_faces(vertices, faces))
-
-
-	# return all_nodes
-	# #return meshes_join_and_weld(beams)
-	return meshes_join_and_weld([all_nodes] + beams)
+
+		# match the resolutions of the tube extremities, splitting boundary vertices spread along the smaller rings
+		refinements = []
+		for u, v in network.edges():
+			if len(tube_extremities[(u, v)]) != len(tube_extremities[(v, u)]):
+				if len(tube_extremities[(u, v)]) < len(tube_extremities[(v, u)]):
+					a, b = u, v
+				else:
+					a, b = v, u
+				refinements.append((tube_extremities[(a, b)], tube_extremities[(b, a)]))
+
+		# splits are planned on the topology before they are applied, so a vertex is split at most once per round,
+		# collapsed rings repeating a vertex and rings needing more points than they have take several rounds
+		count = 0
+		while True:
+			splits = []
+			used = set()
+			for ring, other in refinements:
+				n = len(other) - len(ring)
+				if n <= 0:
+					continue
+				planned = deferred = 0
+				for k in sorted(set([i * len(ring) // n for i in range(min(n, len(ring)))])):
+					bdry_vkey = geom_key_map.get(geometric_key(ring[k]))
+					if bdry_vkey is None:
+						continue
+					if bdry_vkey in used:
+						deferred += 1
+						continue
+					nbr_vkey = None
+					for nbr in all_nodes.vertex_neighbors(bdry_vkey):
+						if not all_nodes.is_edge_on_boundary(bdry_vkey, nbr):
+							nbr_vkey = nbr
+					if nbr_vkey is not None:
+						used.add(bdry_vkey)
+						splits.append((ring, k, bdry_vkey, nbr_vkey))
+						planned += 1
+				if not planned and not deferred:
+					raise ValueError('The tube extremity of {} points cannot be refined to {} points.'.format(len(ring), len(other)))
+			if not splits:
+				break
+
+			old_gkeys = [geometric_key(all_nodes.vertex_coordinates(bdry_vkey)) for ring, k, bdry_vkey, nbr_vkey in splits]
+			new_vkeys = insert_trifaces_on_boundary(all_nodes, [(bdry_vkey, nbr_vkey) for ring, k, bdry_vkey, nbr_vkey in splits], geom_key_map)
+
+			# split vertices are moved, on every ring they belong to
+			moved = {gkey: all_nodes.vertex_coordinates(bdry_vkey) for gkey, (ring, k, bdry_vkey, nbr_vkey) in zip(old_gkeys, splits)}
+			for ring in tube_extremities.values():
+				for j, xyz in enumerate(ring):
+					xyz = moved.get(geometric_key(xyz))
+					if xyz is not None:
+						ring[j] = xyz
+
+			# new points go next to their split vertex, on the side of their other boundary neighbour, from the end of each ring
+			for (ring, k, bdry_vkey, nbr_vkey), new_vkey in sorted(zip(splits, new_vkeys), key=lambda split: split[0][1], reverse=True):
+				after = [geometric_key(all_nodes.vertex_coordinates(nbr)) for nbr in all_nodes.vertex_neighbors(new_vkey) if nbr != bdry_vkey and all_nodes.is_edge_on_boundary(new_vkey, nbr)]
+				i = k if after and geometric_key(ring[k - 1]) in after else k + 1
+				ring.insert(i, all_nodes.vertex_coordinates(new_vkey))
+			count += len(splits)
+
+		s.count(count)
+
+	with stage('skeleton_indexing') as s:
+		# indexed output, where the tube extremities share the vertices of the joints
+		# joint vertices made coincident by insertions on collapsed rings are merged
+		key_index = {}
+		gkey_index = {}
+		vertices = []
+		for vkey in all_nodes.vertices():
+			xyz = all_nodes.vertex_coordinates(vkey)
+			gkey = geometric_key(xyz)
+			if gkey not in gkey_index:
+				gkey_index[gkey] = len(vertices)
+				vertices.append(xyz)
+			key_index[vkey] = gkey_index[gkey]
+		faces = [[key_index[vkey] for vkey in all_nodes.face_vertices(fkey)] for fkey in all_nodes.faces()]
+		faces = [face for face in faces if len(set(face)) == len(face)]
+		s.count(len(vertices))
+
+	with stage('skeleton_stations') as s:
+		# tubes between extremities of the same resolution
+		tubes = []
+		for u, v in network.edges():
+			if len(tube_extremities[(u, v)]) == len(tube_extremities[(v, u)]):
+				l = network.edge_length(u, v) - 2 * radius
+				m = (floor(l / radius) + 1) * 2
+				tubes.append((tube_extremities[(u, v)], list(reversed(tube_extremities[(v, u)])), int(m)))
+
+		if use_numpy:
+			from compas_kagome.tubes import tube_stations_numpy
+			stations = tube_stations_numpy(tubes)
+		else:
+			stations = [tube_stations(*tube) for tube in tubes]
+		s.count(len(tubes))
+
+	with stage('skeleton_beams') as s:
+		for (pt_uv, _, m), (pt_vu, points) in zip(tubes, stations):
+
+			# the first and last stations are the extremities themselves
+			ring_uv = ring_indices(pt_uv, geom_key_map, key_index, vertices)
+			ring_vu = ring_indices(pt_vu, geom_key_map, key_index, vertices)
+			rows = [ring_uv]
+			for polygon in points:
+				# points between the same pair of extremity vertices are shared, for collapsed rings
+				row = []
+				station = {}
+				for j, xyz in enumerate(polygon):
+					pair = (ring_uv[j], ring_vu[j])
+					if pair not in station:
+						station[pair] = len(vertices)
+						vertices.append(xyz)
+					row.append(station[pair])
+				rows.append(row)
+			rows.append(ring_vu)
+			faces += tube_strip_faces(rows)
+		s.count(len(tubes))
+
+	with stage('skeleton_construction') as s:
+		mesh = cls.from_vertices_and_faces(vertices, faces)
+		s.count(len(faces))
+
+	return mesh
+
+
+def tube_stations(pt_uv, pt_vu, m):
+
+	# align the end ring on the start ring with the best cyclic shift, and interpolate the stations in between
+	n = len(pt_uv)
+	dmin = -1
+	imin = None
+	for i in range(n):
+		distance = sum([distance_point_point(pt_uv[j], pt_vu[i + j - len(pt_vu)]) for j in range(n)])
+		if dmin < 0 or distance < dmin:
+			dmin = distance
+			imin = i
+	pt_vu = [pt_vu[imin + j - len(pt_vu)] for j in range(n)]
+	
+	# ab = pt_uv# + pt_uv[0:]
+	# dc = pt_vu# + pt_vu[0:]
+	# line = Polyline([ab[0], dc[0]])
+	# ad = [line.point(i / (m - 1)) for i in range(m)]
+	# bc = ad
+	# vertices, faces = discrete_coons_patch(ab, bc, dc, ad)
+	# tri_faces = []
+	# for (a, b, c, d) in faces:
+	# 	tri_faces += [[a, b, c], [a, c, d]] # reverse?
+	# beams.append(Mesh.from_vertices_and_faces(vertices, tri_faces))
+
+	points = []
+	for i in range(1, m - 1):
+		polygon = []
+		for j in range(n):
+			polygon.append(add_vectors(scale_vector(pt_uv[j], (float(m) - 1 - float(i))/float(m - 1)), scale_vector(pt_vu[j], float(i)/float(m - 1))))
+		points.append(polygon)
+
+	return pt_vu, points
+
+
+def ring_indices(ring, geom_key_map, key_index, vertices):
+
+	# indices of the joint vertices on a ring, other points are added as new vertices
+	indices = []
+	for xyz in ring:
+		vkey = geom_key_map.get(geometric_key(xyz))
+		if vkey is None:
+			indices.append(len(vertices))
+			vertices.append(xyz)
+		else:
+			indices.append(key_index[vkey])
+	return indices
+
+
+def tube_strip_faces(rows):
+
+	# two triangles per quad between consecutive rings of vertex indices
+	faces = []
+	for i in range(1, len(rows)):
+		for j in range(len(rows[i])):
+			a, b, c, d = rows[i - 1][j - 1], rows[i - 1][j], rows[i][j - 1], rows[i][j]
+			for face in ([d, b, a], [c, d, a]): # create staggered pattern?
+				if len(set(face)) == 3:
+					faces.append(face)
+	return faces
 
 
 # ==============================================================================
@@ -198,6 +484,7 @@ if __name__ == '__main__':
 	from compas_kagome.kagome import Kagome
 	from compas.datastructures import Mesh
 	from compas.datastructures import mesh_weld, mesh_conway_ambo, mesh_smooth_area
+	from compas.datastructures import trimesh_subdivide_loop
 	from compas.geometry import Point
 	from compas_view2.app import App
 
@@ -0,0 +1,346 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import numpy as np
+
+from compas_kagome.compact import faces_to_csr
+from compas_kagome.compact import halfedge_arrays
+from compas_kagome.compact import mesh_edges_order
+from compas_kagome.profiling import stage
+from compas_kagome.pyramid import DEFAULT_PYRAMID
+
+
+__all__ = [
+	'trimesh_subdivide_loop_numpy',
+	'mesh_conway_ambo_numpy',
+	'kagome_vertices_and_faces_numpy',
+	'kagome_operator_numpy',
+	'kagome_labels_numpy',
+	]
+
+
+def _lookup(keys, query):
+
+	# positions of query in keys, -1 if missing
+	order = np.argsort(keys, kind='stable')
+	idx = np.searchsorted(keys[order], query)
+	idx[idx == len(keys)] = 0
+	return np.where(keys[order][idx] == query, order[idx], -1)
+
+
+def _edges(faces, number_of_vertices):
+
+	# edges of a triangle mesh in the order of Mesh.edges(), oriented as (u, v)
+	faces = np.asarray(faces, dtype=np.int32)
+	offsets = np.arange(0, 3 * len(faces) + 1, 3, dtype=np.int32)
+	origin, twin, _, face = halfedge_arrays(offsets, faces.ravel(), number_of_vertices)
+	edges = mesh_edges_order(origin, twin, face, number_of_vertices)
+	return np.stack((origin[edges], origin[twin[edges]]), axis=1)
+
+
+### loop ###
+
+def _loop_halfedges(faces, edges, v):
+
+	a, b = edges[:, 0].astype(np.int64), edges[:, 1].astype(np.int64)
+
+	# face halfedges and the third vertex of their face
+	tail = faces.ravel().astype(np.int64)
+	head = faces[:, [1, 2, 0]].ravel()
+	third = faces[:, [2, 0, 1]].ravel()
+	keys = tail * v + head
+	ab = _lookup(keys, a * v + b)
+	ba = _lookup(keys, b * v + a)
+	interior = (ab >= 0) & (ba >= 0)
+	return a, b, tail, head, third, ab, ba, interior
+
+
+def _subdivide_loop_once(xyz, faces, edges, fixed):
+
+	v = len(xyz)
+	f = len(faces)
+	e = len(edges)
+	a, b, tail, head, third, ab, ba, interior = _loop_halfedges(faces, edges, v)
+
+	# even vertices
+	degree = np.bincount(a, minlength=v) + np.bincount(b, minlength=v)
+	total = np.zeros((v, 3))
+	np.add.at(total, a, xyz[b])
+	np.add.at(total, b, xyz[a])
+	alpha = np.where(degree == 3, 3.0 / 16.0, 3.0 / (8 * np.maximum(degree, 1)))
+	even = (1.0 - degree * alpha)[:, None] * xyz + alpha[:, None] * total
+
+	bdry_a, bdry_b = a[~interior], b[~interior]
+	boundary = np.bincount(bdry_a, minlength=v) + np.bincount(bdry_b, minlength=v) > 0
+	total = np.zeros((v, 3))
+	np.add.at(total, bdry_a, xyz[bdry_b])
+	np.add.at(total, bdry_b, xyz[bdry_a])
+	even[boundary] = 0.75 * xyz[boundary] + 0.125 * total[boundary]
+
+	if fixed is not None:
+		even[fixed] = xyz[fixed]
+
+	# odd vertices
+	odd = 0.5 * (xyz[a] + xyz[b])
+	c, d = third[ab[interior]], third[ba[interior]]
+	odd[interior] = (3.0 / 8.0) * (xyz[a[interior]] + xyz[b[interior]]) + (1.0 / 8.0) * (xyz[c] + xyz[d])
+
+	# new faces [wu, u, uv], [uv, v, vw], [vw, w, wu], [uv, vw, wu]
+	ukeys = np.minimum(a, b) * v + np.maximum(a, b)
+	mid = _lookup(ukeys, np.minimum(tail, head) * v + np.maximum(tail, head)).reshape((f, 3)) + v
+	u_, v_, w_ = faces[:, 0], faces[:, 1], faces[:, 2]
+	uv, vw, wu = mid[:, 0], mid[:, 1], mid[:, 2]
+	new_faces = np.stack((
+		np.stack((wu, u_, uv), axis=1),
+		np.stack((uv, v_, vw), axis=1),
+		np.stack((vw, w_, wu), axis=1),
+		np.stack((uv, vw, wu), axis=1),
+		), axis=1).reshape((4 * f, 3)).astype(np.int32)
+
+	# edges of the next level in the order of insertion of the split and added halfedges
+	m = np.arange(e) + v
+	origin = np.concatenate((a, b))
+	other = np.concatenate((m, m))
+	time = np.concatenate((np.arange(e), np.arange(e)))
+	pairs = np.stack((np.stack((uv, wu), axis=1), np.stack((vw, uv), axis=1), np.stack((wu, vw), axis=1)), axis=1).reshape((3 * f, 2))
+	origin = np.concatenate((origin, pairs.min(axis=1)))
+	other = np.concatenate((other, pairs.max(axis=1)))
+	time = np.concatenate((time, np.arange(3 * f)))
+	order = np.lexsort((time, origin))
+	new_edges = np.stack((origin[order], other[order]), axis=1).astype(np.int32)
+
+	return np.concatenate((even, odd)), new_faces, new_edges
+
+
+def _subdivide_loop_operator(faces, edges, v, fixed):
+
+	# sparse matrix of _subdivide_loop_once, from the coarse to the even and odd vertices
+	from scipy.sparse import coo_matrix
+
+	e = len(edges)
+	a, b, tail, head, third, ab, ba, interior = _loop_halfedges(faces, edges, v)
+
+	# even vertices, interior stencils unless on the boundary or fixed
+	degree = np.bincount(a, minlength=v) + np.bincount(b, minlength=v)
+	alpha = np.where(degree == 3, 3.0 / 16.0, 3.0 / (8 * np.maximum(degree, 1)))
+	bdry_a, bdry_b = a[~interior], b[~interior]
+	boundary = np.bincount(bdry_a, minlength=v) + np.bincount(bdry_b, minlength=v) > 0
+	pinned = np.zeros(v, dtype=bool)
+	if fixed is not None:
+		pinned[fixed] = True
+	smooth = ~boundary & ~pinned
+	ring = np.arange(v)
+	rows = [ring[smooth], a[smooth[a]], b[smooth[b]]]
+	cols = [ring[smooth], b[smooth[a]], a[smooth[b]]]
+	vals = [(1.0 - degree * alpha)[smooth], alpha[a][smooth[a]], alpha[b][smooth[b]]]
+	crease = boundary & ~pinned
+	rows += [ring[crease], bdry_a[crease[bdry_a]], bdry_b[crease[bdry_b]]]
+	cols += [ring[crease], bdry_b[crease[bdry_a]], bdry_a[crease[bdry_b]]]
+	vals += [np.full(crease.sum(), 0.75), np.full(crease[bdry_a].sum(), 0.125), np.full(crease[bdry_b].sum(), 0.125)]
+	rows.append(ring[pinned])
+	cols.append(ring[pinned])
+	vals.append(np.ones(pinned.sum()))
+
+	# odd vertices
+	edge = np.arange(e) + v
+	c, d = third[ab[interior]], third[ba[interior]]
+	weight = np.where(interior, 3.0 / 8.0, 0.5)
+	rows += [edge, edge, edge[interior], edge[interior]]
+	cols += [a, b, c, d]
+	vals += [weight, weight, np.full(len(c), 1.0 / 8.0), np.full(len(d), 1.0 / 8.0)]
+
+	return coo_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(v + e, v)).tocsr()
+
+
+def _read_only(arrays):
+	for array in arrays:
+		array.flags.writeable = False
+	return arrays
+
+
+def trimesh_subdivide_loop_numpy(vertices, faces, k=1, fixed=None, pyramid=None):
+
+	if pyramid is not None:
+		key = pyramid.signature(vertices, faces, None if fixed is None else sorted(fixed), 'numpy')
+
+	xyz = np.array(vertices, dtype=np.float64).reshape((-1, 3))
+	faces = np.array(faces, dtype=np.int32).reshape((-1, 3))
+	if fixed is not None:
+		fixed = np.array(list(fixed), dtype=np.int64)
+		if not len(fixed):
+			fixed = None
+
+	edges = _edges(faces, len(xyz))
+
+	if pyramid is not None:
+		# levels are cached as (xyz, faces, edges), the next one being a single step away, and read-only as they are shared
+		level = pyramid.subdivide(key, (xyz, faces, edges), k, lambda level: _read_only(_subdivide_loop_once(level[0], level[1], level[2], fixed)), lambda level: len(level[1]))
+		return level[0], level[1]
+
+	for _ in range(k):
+		xyz, faces, edges = _subdivide_loop_once(xyz, faces, edges, fixed)
+
+	return xyz, faces
+
+
+### ambo ###
+
+def _ambo_quads(face_offsets, face_indices, v):
+
+	origin, twin, nxt, face = halfedge_arrays(face_offsets, face_indices, v)
+	edges = mesh_edges_order(origin, twin, face, v)
+	edges = edges[(face[edges] >= 0) & (face[twin[edges]] >= 0)]
+	u = origin[edges]
+	w = origin[twin[edges]]
+	return np.stack((u, v + face[twin[edges]], w, v + face[edges]), axis=1).astype(np.int32)
+
+
+def _ambo_operator(face_offsets, face_indices, v):
+
+	# sparse matrix of the kagome vertices, the averages of the join quads, from the mesh vertices
+	from scipy.sparse import coo_matrix
+
+	f = len(face_offsets) - 1
+	degree = np.diff(face_offsets)
+	quads = _ambo_quads(face_offsets, face_indices, v)
+	centroids = coo_matrix((np.repeat(1.0 / degree, degree), (np.repeat(np.arange(f), degree), face_indices)), shape=(f, v)).tocsr()
+	join = coo_matrix((np.full(quads.size, 0.25), (np.repeat(np.arange(len(quads)), 4), quads.ravel())), shape=(len(quads), v + f)).tocsr()
+	return join[:, :v] + join[:, v:] @ centroids
+
+
+def mesh_conway_ambo_numpy(vertices, face_offsets, face_indices):
+
+	xyz = np.asarray(vertices, dtype=np.float64).reshape((-1, 3))
+	v = len(xyz)
+	face_offsets = np.asarray(face_offsets, dtype=np.int32)
+	face_indices = np.asarray(face_indices, dtype=np.int32)
+	f = len(face_offsets) - 1
+	degree = np.diff(face_offsets)
+
+	quads = _ambo_quads(face_offsets, face_indices, v)
+
+	# join mesh: one quad [u, vu, v, uv] per interior edge, face centroids after the vertices
+	centroids = np.add.reduceat(xyz[face_indices], face_offsets[:-1], axis=0) / degree[:, None]
+	join_xyz = np.concatenate((xyz, centroids))
+	q = len(quads)
+	join_offsets = np.arange(0, 4 * q + 1, 4, dtype=np.int32)
+	j_origin, j_twin, j_next, j_face = halfedge_arrays(join_offsets, quads.ravel(), v + f)
+
+	# dual of the join mesh: one face per interior join vertex
+	kagome_xyz = join_xyz[quads].mean(axis=1)
+
+	on_boundary = np.zeros(v + f, dtype=bool)
+	on_boundary[j_origin[j_face < 0]] = True
+	valency = np.bincount(j_origin, minlength=v + f)
+	centres = np.flatnonzero(~on_boundary & (valency > 0))
+
+	# ordered faces start from the first neighbour inserted in the join mesh
+	h = np.arange(len(j_origin), dtype=np.int64)
+	time = np.where(j_face < 0, len(j_origin) + h, h)
+	time = np.minimum(time, time[j_twin])
+	order = np.lexsort((time, j_origin))
+	first = np.ones(len(order), dtype=bool)
+	first[1:] = j_origin[order][1:] != j_origin[order][:-1]
+	start = np.full(v + f, -1, dtype=np.int64)
+	start[j_origin[order][first]] = order[first]
+
+	n = valency[centres]
+	offsets = np.zeros(len(centres) + 1, dtype=np.int32)
+	offsets[1:] = np.cumsum(n)
+	indices = np.empty(offsets[-1], dtype=np.int32)
+	current = start[centres]
+	for i in range(n.max() if len(n) else 0):
+		active = i < n
+		# faces are reversed with respect to the ordered vertex faces
+		indices[offsets[:-1][active] + n[active] - 1 - i] = j_face[current[active]]
+		current = j_next[j_twin[current]]
+
+	return kagome_xyz, offsets, indices
+
+
+### kagome ###
+
+def kagome_vertices_and_faces_numpy(vertices, faces, k=1, fixed=None, pyramid=None):
+
+	# subdivision levels are cached in the default pyramid, unless another one is given or pyramid is False
+	if pyramid is None:
+		pyramid = DEFAULT_PYRAMID
+	elif pyramid is False:
+		pyramid = None
+
+	with stage('loop_subdivision') as s:
+		if k > 0:
+			xyz, faces = trimesh_subdivide_loop_numpy(vertices, faces, k, fixed, pyramid)
+			offsets = np.arange(0, 3 * len(faces) + 1, 3, dtype=np.int32)
+			indices = faces.ravel()
+		else:
+			xyz = vertices
+			offsets, indices = faces_to_csr(faces)
+		s.count(len(offsets) - 1)
+	with stage('ambo') as s:
+		kagome_xyz, kagome_offsets, kagome_indices = mesh_conway_ambo_numpy(xyz, offsets, indices)
+		s.count(len(kagome_offsets) - 1)
+	return kagome_xyz, kagome_offsets, kagome_indices
+
+
+def kagome_operator_numpy(vertices, faces, k=1, fixed=None):
+
+	# sparse matrix mapping the coarse vertices to the kagome vertices of kagome_vertices_and_faces_numpy
+	from scipy.sparse import identity
+
+	xyz = np.array(vertices, dtype=np.float64).reshape((-1, 3))
+	operator = identity(len(xyz), format='csr')
+	if k > 0:
+		faces = np.array(faces, dtype=np.int32).reshape((-1, 3))
+		if fixed is not None:
+			fixed = np.array(list(fixed), dtype=np.int64)
+			if not len(fixed):
+				fixed = None
+		edges = _edges(faces, len(xyz))
+		for _ in range(k):
+			operator = _subdivide_loop_operator(faces, edges, len(xyz), fixed) @ operator
+			xyz, faces, edges = _subdivide_loop_once(xyz, faces, edges, fixed)
+		offsets = np.arange(0, 3 * len(faces) + 1, 3, dtype=np.int32)
+		indices = faces.ravel()
+	else:
+		offsets, indices = faces_to_csr(faces)
+		offsets = np.asarray(offsets, dtype=np.int32)
+		indices = np.asarray(indices, dtype=np.int32)
+	return (_ambo_operator(offsets, indices, len(xyz)) @ operator).tocsr()
+
+
+def kagome_labels_numpy(faces, number_of_vertices, k=1):
+
+	# integer barycentric coordinates of the kagome vertices of kagome_vertices_and_faces_numpy on the coarse faces, scaled by 2 ** (k + 1),
+	# as a sparse matrix: the midpoints of the dense edges, which identify kagome vertices whatever the numbering of the coarse and dense meshes
+	from scipy.sparse import coo_matrix
+	from scipy.sparse import identity
+	from scipy.sparse import vstack
+
+	v = number_of_vertices
+	labels = identity(v, dtype=np.int64, format='csr')
+	if k > 0:
+		faces = np.array(faces, dtype=np.int32).reshape((-1, 3))
+		edges = _edges(faces, v)
+		xyz = np.zeros((v, 3))
+		for _ in range(k):
+			# even vertices stay where they are, odd vertices are the midpoints of the edges
+			e = len(edges)
+			midpoints = coo_matrix((np.ones(2 * e, dtype=np.int64), (np.repeat(np.arange(e), 2), edges.ravel())), shape=(e, len(xyz)))
+			labels = vstack((2 * labels, midpoints @ labels)).tocsr()
+			xyz, faces, edges = _subdivide_loop_once(xyz, faces, edges, None)
+		offsets = np.arange(0, 3 * len(faces) + 1, 3, dtype=np.int32)
+		indices = faces.ravel()
+	else:
+		offsets, indices = faces_to_csr(faces)
+	quads = _ambo_quads(np.asarray(offsets, dtype=np.int32), np.asarray(indices, dtype=np.int32), labels.shape[0])
+	return (labels[quads[:, 0]] + labels[quads[:, 2]]).tocsr()
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+	pass
@@ -0,0 +1,64 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import numpy as np
+
+
+__all__ = [
+	'ring_alignments_numpy',
+	'tube_stations_numpy',
+	]
+
+
+def ring_alignments_numpy(rings_uv, rings_vu):
+
+	# best cyclic shift of each end ring for a batch of rings of the same size, as (B, n, 3) arrays
+	b, n = rings_uv.shape[:2]
+	shifts = np.arange(n)
+	distance = np.zeros((b, n))
+	# accumulated one point at a time to sum as tube_stations does
+	for j in range(n):
+		d = rings_vu[:, (shifts + j) % n] - rings_uv[:, j, None]
+		distance += np.sqrt(d[..., 0] ** 2 + d[..., 1] ** 2 + d[..., 2] ** 2)
+	return np.argmin(distance, axis=1)
+
+
+def tube_stations_numpy(tubes):
+
+	# tube_stations for all tubes, batched by ring size
+	stations = [None] * len(tubes)
+	groups = {}
+	for index, (pt_uv, pt_vu, m) in enumerate(tubes):
+		groups.setdefault(len(pt_uv), []).append(index)
+
+	for n, indices in groups.items():
+		rings_uv = np.array([tubes[index][0] for index in indices], dtype=np.float64).reshape((-1, n, 3))
+		rings_vu = np.array([tubes[index][1] for index in indices], dtype=np.float64).reshape((-1, n, 3))
+		imin = ring_alignments_numpy(rings_uv, rings_vu)
+		rings_vu = rings_vu[np.arange(len(indices))[:, None], (imin[:, None] + np.arange(n)) % n]
+
+		# one row per intermediate station of every tube
+		m = np.array([tubes[index][2] for index in indices])
+		count = np.maximum(m - 2, 0)
+		tube = np.repeat(np.arange(len(indices)), count)
+		i = (np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)).astype(np.float64) + 1
+		mf = m[tube].astype(np.float64)
+		a = (mf - 1 - i) / (mf - 1)
+		b = i / (mf - 1)
+		points = (rings_uv[tube] * a[:, None, None] + rings_vu[tube] * b[:, None, None]).tolist()
+
+		start = 0
+		for k, index in enumerate(indices):
+			stations[index] = (rings_vu[k].tolist(), points[start: start + count[k]])
+			start += count[k]
+
+	return stations
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+	pass
@@ -0,0 +1,127 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import numpy as np
+
+from compas_kagome.compact import faces_to_csr
+
+
+__all__ = [
+	'polyedge_weaving_numpy',
+	'weaving_violations_numpy',
+	'kagome_polyedge_weaving_numpy',
+	'kagome_weaving_violations_numpy',
+	]
+
+
+def _last_per_key(keys, values):
+
+	# dict-like semantics: later writes overwrite earlier ones
+	order = np.argsort(keys, kind='stable')
+	keys = keys[order]
+	last = np.ones(len(keys), dtype=bool)
+	last[:-1] = keys[1:] != keys[:-1]
+	return keys[last], values[order][last]
+
+
+def _corner_offsets(face_offsets, face_indices, polyedge_offsets, polyedge_indices, number_of_vertices):
+
+	# offsets written at each face corner, keyed by vertex and polyedge, in the order of Kagome.polyedge_weaving
+	v = number_of_vertices
+	face_offsets = np.asarray(face_offsets, dtype=np.int64)
+	face_indices = np.asarray(face_indices, dtype=np.int64)
+	polyedge_offsets = np.asarray(polyedge_offsets, dtype=np.int64)
+	polyedge_indices = np.asarray(polyedge_indices, dtype=np.int64)
+	lengths = np.diff(polyedge_offsets)
+	n = len(lengths)
+
+	# edge to polyedge index, the last polyedge through an edge wins
+	polyedge_ids = np.repeat(np.arange(n), lengths)
+	inner = np.ones(len(polyedge_indices), dtype=bool)
+	inner[polyedge_offsets[1:] - 1] = False
+	u, w, ids = polyedge_indices[inner], polyedge_indices[1:][inner[:-1]], polyedge_ids[inner]
+	edge_keys, edge_polyedge = _last_per_key(np.concatenate((u * v + w, w * v + u)), np.concatenate((ids, ids)))
+
+	# polyedge of each face halfedge
+	degree = np.diff(face_offsets)
+	nxt = np.arange(1, len(face_indices) + 1)
+	nxt[face_offsets[1:] - 1] = face_offsets[:-1]
+	query = face_indices * v + face_indices[nxt]
+	idx = np.searchsorted(edge_keys, query)
+	idx[idx == len(edge_keys)] = 0
+	if np.any(edge_keys[idx] != query):
+		raise KeyError(int(np.flatnonzero(edge_keys[idx] != query)[0]))
+	halfedge_polyedge = edge_polyedge[idx]
+
+	# +1 then -1 at triangle corners, -1 then +1 at the other corners
+	sign = np.where(np.repeat(degree, degree) == 3, 1, -1).astype(np.int8)
+	centre = face_indices[nxt]
+	keys = np.stack((centre * n + halfedge_polyedge, centre * n + halfedge_polyedge[nxt]), axis=1).ravel()
+	values = np.stack((sign, -sign), axis=1).ravel()
+	return keys, values, polyedge_ids, n
+
+
+def polyedge_weaving_numpy(face_offsets, face_indices, polyedge_offsets, polyedge_indices, number_of_vertices):
+
+	# weave offsets as one int8 array aligned with the polyedge indices
+	keys, values, polyedge_ids, n = _corner_offsets(face_offsets, face_indices, polyedge_offsets, polyedge_indices, number_of_vertices)
+	keys, values = _last_per_key(keys, values)
+
+	query = np.asarray(polyedge_indices, dtype=np.int64) * n + polyedge_ids
+	idx = np.searchsorted(keys, query)
+	idx[idx == len(keys)] = 0
+	if np.any(keys[idx] != query):
+		raise KeyError(int(polyedge_ids[keys[idx] != query][0]))
+	return values[idx]
+
+
+def weaving_violations_numpy(face_offsets, face_indices, polyedge_offsets, polyedge_indices, weave, number_of_vertices):
+
+	# vertices where the two polyedge passes do not have opposite offsets, and vertices where faces disagree on an offset
+	polyedge_offsets = np.asarray(polyedge_offsets, dtype=np.int64)
+	polyedge_indices = np.asarray(polyedge_indices, dtype=np.int64)
+	start, end = polyedge_offsets[:-1], polyedge_offsets[1:] - 1
+	passes = np.ones(len(polyedge_indices), dtype=bool)
+	passes[end[polyedge_indices[start] == polyedge_indices[end]]] = False
+	counts = np.bincount(polyedge_indices[passes], minlength=number_of_vertices)
+	sums = np.bincount(polyedge_indices[passes], weights=np.asarray(weave, dtype=np.float64)[passes], minlength=number_of_vertices)
+	crossings = np.flatnonzero((counts == 2) & (sums != 0))
+
+	keys, values, polyedge_ids, n = _corner_offsets(face_offsets, face_indices, polyedge_offsets, polyedge_indices, number_of_vertices)
+	order = np.argsort(keys, kind='stable')
+	keys, values = keys[order], values[order]
+	differ = (keys[1:] == keys[:-1]) & (values[1:] != values[:-1])
+	conflicts = np.unique(keys[1:][differ] // max(n, 1))
+
+	return crossings, conflicts
+
+
+def _kagome_arrays(kagome):
+	key_index = kagome.key_index()
+	face_offsets, face_indices = faces_to_csr([key_index[vkey] for vkey in kagome.face_vertices(fkey)] for fkey in kagome.faces())
+	polyedge_offsets, polyedge_indices = faces_to_csr([key_index[vkey] for vkey in polyedge] for polyedge in kagome.polyedge_data)
+	return face_offsets, face_indices, polyedge_offsets, polyedge_indices
+
+
+def kagome_polyedge_weaving_numpy(kagome):
+
+	face_offsets, face_indices, polyedge_offsets, polyedge_indices = _kagome_arrays(kagome)
+	return polyedge_weaving_numpy(face_offsets, face_indices, polyedge_offsets, polyedge_indices, kagome.number_of_vertices()), polyedge_offsets
+
+
+def kagome_weaving_violations_numpy(kagome):
+
+	face_offsets, face_indices, polyedge_offsets, polyedge_indices = _kagome_arrays(kagome)
+	weave = polyedge_weaving_numpy(face_offsets, face_indices, polyedge_offsets, polyedge_indices, kagome.number_of_vertices())
+	crossings, conflicts = weaving_violations_numpy(face_offsets, face_indices, polyedge_offsets, polyedge_indices, weave, kagome.number_of_vertices())
+	keys = list(kagome.vertices())
+	return [keys[i] for i in crossings.tolist()], [keys[i] for i in conflicts.tolist()]
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+	pass
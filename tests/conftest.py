@@ -0,0 +1,20 @@
+import pytest
+
+from compas.datastructures import Mesh
+
+
+def patch():
+	# four triangles around a raised centre, with a boundary
+	vertices = [[0., 0., 0.], [1., 0., 0.], [1., 1., 0.], [0., 1., 0.], [.5, .5, .2]]
+	faces = [[0, 1, 4], [1, 2, 4], [2, 3, 4], [3, 0, 4]]
+	return Mesh.from_vertices_and_faces(vertices, faces)
+
+
+def icosahedron():
+	# closed, with twelve singularities
+	return Mesh.from_polyhedron(20)
+
+
+@pytest.fixture(params=[patch, icosahedron], ids=['patch', 'icosahedron'])
+def coarse_mesh(request):
+	return request.param()
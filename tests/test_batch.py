@@ -0,0 +1,22 @@
+from compas.datastructures import Mesh
+
+from compas_kagome.batch import kagome_jobs
+from compas_kagome.batch import run_jobs
+
+
+def test_resume_depends_on_options_and_inputs(tmp_path):
+	input_dir = tmp_path / 'in'
+	output_dir = str(tmp_path / 'out')
+	input_dir.mkdir()
+	Mesh.from_polyhedron(4).to_obj(str(input_dir / 'tet.obj'))
+	Mesh.from_polyhedron(4).to_off(str(input_dir / 'tet.off'))
+
+	jobs = kagome_jobs(str(input_dir), output_dir, [1])
+	assert len(set(job['output'] for job in jobs)) == 2
+	assert len(run_jobs(jobs, output_dir, verbose=False)) == 2
+	assert len(run_jobs(jobs, output_dir, verbose=False)) == 0
+
+	jobs = kagome_jobs(str(input_dir), output_dir, [1], fixed_boundary=False)
+	assert len(run_jobs(jobs, output_dir, verbose=False)) == 2
+	jobs = kagome_jobs(str(input_dir), output_dir, [1], colouring='none')
+	assert len(run_jobs(jobs, output_dir, verbose=False)) == 2
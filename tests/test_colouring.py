@@ -0,0 +1,14 @@
+import pytest
+
+from compas_kagome.kagome import Kagome
+from compas_kagome.colouring import kagome_polyedge_colouring
+from compas_kagome.colouring import kagome_polyedge_structured_colouring
+
+
+@pytest.mark.parametrize('k', [1, 2, 3])
+def test_structured_colouring(coarse_mesh, k):
+	kagome = Kagome.from_mesh(coarse_mesh, k)
+	colours = kagome_polyedge_structured_colouring(kagome)
+	offsets, indices = kagome.polyedge_adjacency()
+	assert all(colours[idx] != colours[nbr] for idx in range(len(offsets) - 1) for nbr in indices[offsets[idx]: offsets[idx + 1]])
+	assert len(set(colours)) <= len(set(kagome_polyedge_colouring(kagome)))
@@ -0,0 +1,56 @@
+import pytest
+
+import numpy as np
+
+from compas_kagome.kagome import Kagome
+from compas_kagome.compact import CompactKagome
+
+
+@pytest.mark.parametrize('k', [1, 2, 3])
+def test_compact_polyedges(coarse_mesh, k):
+	kagome = Kagome.from_mesh(coarse_mesh, k)
+	assert kagome.to_compact().polyedges() == kagome.polyedges()
+
+
+def test_npy_round_trip(coarse_mesh, tmp_path):
+	# a fresh kagome, whose polyedges are not traced yet
+	kagome = Kagome.from_mesh(coarse_mesh, 2)
+	path = str(tmp_path / 'kagome')
+	kagome.to_npy(path)
+	compact = CompactKagome.from_npy(path)
+	assert compact.to_vertices_and_faces() == kagome.to_compact().to_vertices_and_faces()
+	assert compact.polyedge_data == kagome.polyedge_data
+	assert compact.polyedge_weaving() == kagome.polyedge_weaving()
+	assert Kagome.from_npy(path).polyedge_data == kagome.polyedge_data
+
+
+def test_polyedge_arrays_not_stored(coarse_mesh, tmp_path):
+	path = str(tmp_path / 'kagome')
+	CompactKagome.from_mesh(coarse_mesh, 1).save_npy(path)
+	with pytest.raises(ValueError):
+		CompactKagome.from_npy(path).polyedge_arrays()
+
+
+def test_npy_arrays(coarse_mesh, tmp_path):
+	kagome = Kagome.from_mesh(coarse_mesh, 2)
+	kagome.delete_face(next(iter(kagome.faces())))
+	kagome.remove_unused_vertices()
+	colours = list(range(len(kagome.polyedge_data)))
+	path = str(tmp_path / 'kagome')
+	kagome.to_npy(path, weave=False, colours=colours)
+
+	compact = CompactKagome.from_npy(path)
+	assert isinstance(compact.xyz, np.memmap)
+	assert compact.polyedge_weave is None
+	assert compact.polyedge_colours.tolist() == colours
+
+	# keys survive the round trip
+	loaded = Kagome.from_npy(path)
+	assert list(loaded.vertices()) == list(kagome.vertices())
+	assert list(loaded.faces()) == list(kagome.faces())
+	assert [loaded.face_vertices(fkey) for fkey in loaded.faces()] == [kagome.face_vertices(fkey) for fkey in kagome.faces()]
+	assert np.allclose([loaded.vertex_coordinates(vkey) for vkey in loaded.vertices()], [kagome.vertex_coordinates(vkey) for vkey in kagome.vertices()])
+
+	(tmp_path / 'kagome.json').write_text('{"format": "other"}')
+	with pytest.raises(ValueError):
+		CompactKagome.from_npy(str(tmp_path))
@@ -0,0 +1,10 @@
+from compas_kagome.kagome import Kagome
+
+
+def test_iter_polyedges(coarse_mesh):
+	kagome = Kagome.from_mesh(coarse_mesh, 2)
+	items = list(kagome.iter_polyedges())
+	assert [points for i, points, frames, weave in items] == kagome.polylines()
+	assert [frames for i, points, frames, weave in items] == kagome.polyline_frames()
+	assert [weave for i, points, frames, weave in items] == kagome.polyedge_weaving()
+	assert [item for chunk in kagome.iter_polyedges(chunk_size=5) for item in chunk] == items
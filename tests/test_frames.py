@@ -0,0 +1,16 @@
+import pytest
+
+import numpy as np
+
+from compas_kagome.kagome import Kagome
+
+
+@pytest.mark.parametrize('k', [1, 2, 3])
+def test_polyline_frames_numpy(coarse_mesh, k):
+	kagome = Kagome.from_mesh(coarse_mesh, k)
+	frames = kagome.polyline_frames()
+	frames_numpy, offsets = kagome.polyline_frames_numpy()
+	assert [len(polyline) for polyline in frames] == np.diff(offsets).tolist()
+	assert np.allclose([frame for polyline in frames for frame in polyline], frames_numpy)
+	frames_compact, offsets_compact = kagome.to_compact().polyline_frames()
+	assert np.allclose(frames_compact, frames_numpy)
@@ -0,0 +1,51 @@
+import pytest
+
+from compas_kagome.kagome import Kagome
+from compas_kagome.polyedges import PolyedgeIndex
+from compas_kagome.polyedges import trace_polyedges_reference
+
+
+@pytest.mark.parametrize('k', [1, 2, 3])
+def test_polyedges_match_reference(coarse_mesh, k):
+	kagome = Kagome.from_mesh(coarse_mesh, k)
+	assert kagome.polyedges() == trace_polyedges_reference(kagome)
+
+
+def test_polyedge_data_is_traced_once_and_invalidated(coarse_mesh):
+	kagome = Kagome.from_mesh(coarse_mesh, 2)
+	polyedges = kagome.polyedge_data
+	kagome.polylines()
+	kagome.polyedge_weaving()
+	assert kagome.polyedge_data is polyedges
+	kagome.delete_face(next(iter(kagome.faces())))
+	assert kagome.polyedge_data is not polyedges
+	assert kagome.polyedge_data == kagome.polyedges()
+
+
+@pytest.mark.parametrize('k', [1, 3])
+def test_parallel_polyedges(coarse_mesh, k):
+	kagome = Kagome.from_mesh(coarse_mesh, k)
+	assert kagome.polyedges(processes=2) == kagome.polyedges()
+	compact = kagome.to_compact()
+	assert compact.polyedges(processes=2) == compact.polyedges()
+
+	# edited, so that the edges are not in the order of the faces
+	fkey = kagome.hex_faces()[0]
+	vertices = kagome.face_vertices(fkey)
+	kagome.delete_face(fkey)
+	kagome.delete_face(kagome.tri_faces()[-1])
+	kagome.add_face(vertices)
+	assert kagome.polyedges(processes=2) == kagome.polyedges()
+
+
+@pytest.mark.parametrize('added', [0, 1, 3])
+def test_polyedge_index_replace(added):
+	polyedges = [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9, 10], [11, 12, 0]]
+	index = PolyedgeIndex([list(polyedge) for polyedge in polyedges])
+	new = [[20, 21], [22, 23, 24], [25, 26]][:added]
+	index.replace([0, 2], new)
+	assert sorted(index.polyedges) == sorted(polyedges[1:2] + polyedges[3:] + new)
+	rebuilt = PolyedgeIndex(index.polyedges)
+	assert index.edge_polyedge == rebuilt.edge_polyedge
+	assert index.edge_position == rebuilt.edge_position
+	assert {vkey: sorted(indices) for vkey, indices in index.vertex_polyedges.items()} == {vkey: sorted(indices) for vkey, indices in rebuilt.vertex_polyedges.items()}
@@ -0,0 +1,33 @@
+import time
+
+from compas_kagome.kagome import Kagome
+from compas_kagome.profiling import profile
+from compas_kagome.profiling import stage
+
+
+def test_profile_stages(coarse_mesh):
+	with profile() as stats:
+		kagome = Kagome.from_mesh(coarse_mesh, 2)
+		kagome.polyedge_weaving()
+	assert 'loop_subdivision' in stats and 'weaving' in stats
+	# the polyedges are traced lazily within the weaving stage, and timed apart
+	assert 'polyedge_tracing' in stats
+	assert stats['weaving']['calls'] == 1
+	assert all(entry['seconds'] >= 0 for entry in stats.stages.values())
+
+	# nothing is recorded outside of a profile
+	kagome.polyedge_weaving()
+	assert stats['weaving']['calls'] == 1
+
+
+def test_nested_stages_are_exclusive():
+	with profile() as stats:
+		with stage('outer') as s:
+			s.count(2)
+			time.sleep(.05)
+			with stage('inner'):
+				time.sleep(.1)
+	assert stats['outer']['elements'] == 2
+	assert stats['inner']['seconds'] >= .1
+	assert .05 <= stats['outer']['seconds'] < .1
+	assert abs(stats.total() - stats['outer']['seconds'] - stats['inner']['seconds']) < 1e-12
@@ -0,0 +1,67 @@
+import pytest
+
+import numpy as np
+
+from compas_kagome.kagome import Kagome
+from compas_kagome.pyramid import DEFAULT_PYRAMID
+from compas_kagome.pyramid import SubdivisionPyramid
+
+
+@pytest.mark.parametrize('k', [1, 2, 3, 4])
+def test_pyramid_matches_uncached(coarse_mesh, k):
+	pyramid = SubdivisionPyramid()
+	vertices, faces = Kagome.from_mesh_numpy(coarse_mesh, k, pyramid=False).to_vertices_and_faces()
+	for _ in range(2):
+		vertices_cached, faces_cached = Kagome.from_mesh_numpy(coarse_mesh, k, pyramid=pyramid).to_vertices_and_faces()
+		assert faces_cached == faces
+		assert np.allclose(vertices_cached, vertices)
+	assert (pyramid.hits, pyramid.misses) == (1, 1)
+
+	kagome = Kagome.from_mesh(coarse_mesh, k, pyramid=SubdivisionPyramid())
+	assert (kagome.number_of_vertices(), kagome.number_of_faces()) == (len(vertices), len(faces))
+
+
+def test_pyramid_one_step_per_level(coarse_mesh):
+	pyramid = SubdivisionPyramid()
+	Kagome.from_mesh_numpy(coarse_mesh, 3, pyramid=pyramid)
+	assert len(pyramid.levels) == 3
+	Kagome.from_mesh_numpy(coarse_mesh, 4, pyramid=pyramid)
+	assert len(pyramid.levels) == 4 and pyramid.misses == 2
+
+	# subdivide_once is called once for k + 1 after k, not at all for a cached level
+	calls = []
+
+	def subdivide_once(level):
+		calls.append(level)
+		return level + 1
+
+	pyramid = SubdivisionPyramid()
+	assert pyramid.subdivide('key', 0, 3, subdivide_once, lambda level: 1) == 3
+	assert pyramid.subdivide('key', 0, 4, subdivide_once, lambda level: 1) == 4
+	assert calls == [0, 1, 2, 3]
+	assert pyramid.subdivide('key', 0, 2, subdivide_once, lambda level: 1) == 2
+	assert len(calls) == 4
+	assert (pyramid.hits, pyramid.misses) == (1, 2)
+
+
+def test_pyramid_eviction():
+	pyramid = SubdivisionPyramid(maxfaces=100)
+	for i in range(10):
+		pyramid.put('key', i, i, 30)
+		pyramid.get('key', 0)
+		assert pyramid.faces <= pyramid.maxfaces
+	# least recently used levels are evicted first, level 0 being used after each put
+	assert sorted(k for key, k in pyramid.levels) == [0, 8, 9]
+
+	# a level larger than the budget is kept alone
+	pyramid.put('key', 10, 10, 200)
+	assert list(pyramid.levels) == [('key', 10)]
+
+
+def test_default_pyramid(coarse_mesh):
+	DEFAULT_PYRAMID.clear()
+	kagome = Kagome.from_mesh_numpy(coarse_mesh, 2)
+	assert Kagome.from_mesh_numpy(coarse_mesh, 2).to_vertices_and_faces() == kagome.to_vertices_and_faces()
+	assert (DEFAULT_PYRAMID.hits, DEFAULT_PYRAMID.misses) == (1, 1)
+	Kagome.from_mesh_numpy(coarse_mesh, 2, pyramid=False)
+	assert (DEFAULT_PYRAMID.hits, DEFAULT_PYRAMID.misses) == (1, 1)
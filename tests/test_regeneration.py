@@ -0,0 +1,84 @@
+import pytest
+
+import numpy as np
+
+from compas_kagome.kagome import Kagome
+from compas_kagome.polyedges import PolyedgeIndex
+from compas_kagome.regeneration import KagomeRegenerator
+
+
+@pytest.mark.parametrize('k', [1, 2, 3])
+def test_regeneration_matches_rebuild(coarse_mesh, k):
+	regenerator = KagomeRegenerator(coarse_mesh, k)
+	polyedges = regenerator.kagome.polyedge_data
+	for i, vkey in enumerate(list(coarse_mesh.vertices())[:3]):
+		xyz = coarse_mesh.vertex_coordinates(vkey)
+		coarse_mesh.vertex_attributes(vkey, 'xyz', [xyz[0] + .1, xyz[1], xyz[2] - .05 * i])
+		updated = regenerator.update(coarse_mesh)
+		assert updated
+		vertices, faces = regenerator.kagome.to_vertices_and_faces()
+		vertices_rebuilt, faces_rebuilt = Kagome.from_mesh_numpy(coarse_mesh, k).to_vertices_and_faces()
+		assert faces == faces_rebuilt
+		assert np.allclose(vertices, vertices_rebuilt, atol=1e-12)
+	assert regenerator.kagome.polyedge_data is polyedges
+
+
+def assert_same_kagome(kagome, coarse_mesh, k):
+	# same vertices, faces and polyedges as a kagome built from scratch, up to the vertex keys
+	from scipy.spatial import cKDTree
+	rebuilt = Kagome.from_mesh_numpy(coarse_mesh, k)
+	keys = list(kagome.vertices())
+	distances, indices = cKDTree([rebuilt.vertex_coordinates(vkey) for vkey in rebuilt.vertices()]).query([kagome.vertex_coordinates(vkey) for vkey in keys])
+	assert kagome.number_of_vertices() == rebuilt.number_of_vertices()
+	assert distances.max() < 1e-9
+	key_key = dict(zip(keys, [list(rebuilt.vertices())[i] for i in indices.tolist()]))
+
+	def faces(mesh, key_key):
+		return set(frozenset(key_key[vkey] for vkey in mesh.face_vertices(fkey)) for fkey in mesh.faces())
+
+	def polyedges(mesh, key_key):
+		return set(frozenset(frozenset((key_key[u], key_key[v])) for u, v in zip(polyedge[:-1], polyedge[1:])) for polyedge in mesh.polyedge_data)
+
+	identity = {vkey: vkey for vkey in rebuilt.vertices()}
+	assert faces(kagome, key_key) == faces(rebuilt, identity)
+	assert polyedges(kagome, key_key) == polyedges(rebuilt, identity)
+
+
+@pytest.mark.parametrize('k', [1, 2])
+def test_regeneration_remeshes_on_topology_edit(coarse_mesh, k):
+	regenerator = KagomeRegenerator(coarse_mesh, k)
+	kagome = regenerator.kagome
+	polyedges = [list(polyedge) for polyedge in kagome.polyedge_data]
+	fkey = next(iter(coarse_mesh.faces()))
+	vertices = coarse_mesh.face_vertices(fkey)
+
+	# deleted face, the polyedges away from it keep their ids
+	coarse_mesh.delete_face(fkey)
+	coarse_mesh.remove_unused_vertices()
+	assert regenerator.update(coarse_mesh)
+	assert regenerator.kagome is kagome
+	assert_same_kagome(kagome, coarse_mesh, k)
+	assert any(polyedge == polyedges[i] for i, polyedge in enumerate(kagome.polyedge_data))
+
+	# face added back, and a face split at a new vertex
+	if all(vkey in coarse_mesh.vertex for vkey in vertices):
+		coarse_mesh.add_face(vertices)
+		regenerator.update(coarse_mesh)
+		assert_same_kagome(kagome, coarse_mesh, k)
+	fkey = next(iter(coarse_mesh.faces()))
+	x, y, z = coarse_mesh.face_centroid(fkey)
+	a, b, c = coarse_mesh.face_vertices(fkey)
+	d = coarse_mesh.add_vertex(x=x, y=y, z=z + .2)
+	coarse_mesh.delete_face(fkey)
+	for face in [[a, b, d], [b, c, d], [c, a, d]]:
+		coarse_mesh.add_face(face)
+	assert d not in regenerator.keys
+	regenerator.update(coarse_mesh)
+	assert regenerator.kagome is kagome
+	assert_same_kagome(kagome, coarse_mesh, k)
+	assert kagome.polyedge_index().edge_polyedge == PolyedgeIndex(kagome.polyedge_data).edge_polyedge
+
+	# moves after a retopology
+	coarse_mesh.vertex_attribute(d, 'z', z + .3)
+	assert regenerator.update(coarse_mesh)
+	assert_same_kagome(kagome, coarse_mesh, k)
@@ -0,0 +1,60 @@
+import pytest
+
+from compas_kagome.kagome import Kagome
+
+
+def singularities_reference(kagome):
+	# face scans of the previous implementation
+	def degree(fkey):
+		return len(kagome.face_vertices(fkey))
+	singular, negative = set(), set()
+	for fkey in kagome.faces():
+		nbrs = [degree(nbr) for nbr in kagome.face_neighbors(fkey)]
+		if (all(d == 3 for d in nbrs) and degree(fkey) != 6) or (all(d == 6 for d in nbrs) and degree(fkey) != 3):
+			singular.add(fkey)
+		if all(d == 3 for d in nbrs) and degree(fkey) > 6:
+			negative.add(fkey)
+	return singular, negative
+
+
+@pytest.mark.parametrize('k', [1, 2])
+def test_face_degree_index(coarse_mesh, k):
+	kagome = Kagome.from_mesh(coarse_mesh, k)
+	assert kagome.tri_faces() == [fkey for fkey in kagome.faces() if len(kagome.face_vertices(fkey)) == 3]
+	assert kagome.hex_faces() == [fkey for fkey in kagome.faces() if len(kagome.face_vertices(fkey)) == 6]
+	assert (set(kagome.singularities()), set(kagome.negative_singularities())) == singularities_reference(kagome)
+
+
+def test_tracked_singularities_match_recompute(coarse_mesh):
+	kagome = Kagome.from_mesh(coarse_mesh, 2)
+	kagome.track_singularities()
+
+	def check():
+		assert (set(kagome.singularities()), set(kagome.negative_singularities())) == singularities_reference(kagome)
+
+	check()
+	hexagon = kagome.hex_faces()[0]
+	vertices = kagome.face_vertices(hexagon)
+	kagome.delete_face(hexagon)
+	check()
+	kagome.add_face(vertices)
+	check()
+
+	# triangles around a hexagon, then a four-valent vertex
+	triangles = [kagome.halfedge[v][u] for u, v in kagome.face_halfedges(kagome.hex_faces()[-1])]
+	for fkey in triangles[:2]:
+		if fkey is not None:
+			kagome.delete_face(fkey)
+			check()
+	kagome.delete_vertex(next(vkey for vkey in kagome.vertices() if kagome.vertex_degree(vkey) == 4))
+	check()
+
+	# in-place operations of compas
+	u, v = next(iter(kagome.edges()))
+	kagome.split_edge(u, v)
+	check()
+	fkey = kagome.hex_faces()[0]
+	kagome.split_face(fkey, *kagome.face_vertices(fkey)[0: 4: 3])
+	check()
+	kagome.add_face(kagome.face_vertices(kagome.hex_faces()[0])[:3])
+	check()
@@ -0,0 +1,56 @@
+from compas.datastructures import Mesh
+
+from compas_kagome.skeleton import JointCache
+from compas_kagome.skeleton import trimesh_skeleton
+
+
+def lattice_lines(n, layers=2, spacing=2.):
+	# lattice with diagonals, as in scripts/benchmark_kagome.py, with joints of degree 3 to 6
+	points = {}
+	for x in range(n):
+		for y in range(n):
+			for z in range(layers):
+				points[x, y, z] = [spacing * x, spacing * y, spacing * z]
+	lines = []
+	for (x, y, z), point in points.items():
+		for dx, dy, dz in [(1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 1)]:
+			other = points.get((x + dx, y + dy, z + dz))
+			if other is not None:
+				lines.append([point, other])
+	return lines
+
+
+def closed_manifold(mesh):
+	mesh.remove_unused_vertices()
+	return mesh.is_manifold() and not any(mesh.is_edge_on_boundary(u, v) for u, v in mesh.edges())
+
+
+def test_lattice_skeleton_is_closed_manifold():
+	for n in (2, 3):
+		assert closed_manifold(trimesh_skeleton(Mesh, lattice_lines(n), radius=.4))
+
+
+def test_joint_cache():
+	lines = lattice_lines(3)
+	cache = JointCache()
+	mesh = trimesh_skeleton(Mesh, lines, radius=.4, joint_cache=cache)
+	assert cache.hits == 0 and len(cache.templates) == cache.misses
+	assert mesh.number_of_faces() == trimesh_skeleton(Mesh, lines, radius=.4).number_of_faces()
+
+	# joints built again are all instanced from the templates
+	misses = cache.misses
+	assert trimesh_skeleton(Mesh, lines, radius=.4, joint_cache=cache).to_vertices_and_faces() == mesh.to_vertices_and_faces()
+	assert cache.misses == misses and cache.hits == misses
+	assert closed_manifold(mesh)
+
+	cache = JointCache(maxsize=2)
+	trimesh_skeleton(Mesh, lines, radius=.4, joint_cache=cache)
+	assert len(cache.templates) == 2
+
+
+def test_tube_stations_numpy():
+	for n in (2, 3):
+		lines = lattice_lines(n)
+		mesh = trimesh_skeleton(Mesh, lines, radius=.4)
+		mesh_numpy = trimesh_skeleton(Mesh, lines, radius=.4, use_numpy=True)
+		assert mesh_numpy.to_vertices_and_faces() == mesh.to_vertices_and_faces()
@@ -0,0 +1,12 @@
+import pytest
+
+from compas_kagome.kagome import Kagome
+
+
+@pytest.mark.parametrize('k', [0, 1, 2, 3])
+@pytest.mark.parametrize('fixed_boundary', [True, False])
+def test_from_mesh_numpy_topology(coarse_mesh, k, fixed_boundary):
+	vertices, faces = Kagome.from_mesh(coarse_mesh, k, fixed_boundary).to_vertices_and_faces()
+	vertices_numpy, faces_numpy = Kagome.from_mesh_numpy(coarse_mesh, k, fixed_boundary).to_vertices_and_faces()
+	assert faces_numpy == faces
+	assert len(vertices_numpy) == len(vertices)
@@ -0,0 +1,36 @@
+import pytest
+
+import numpy as np
+
+from compas_kagome.kagome import Kagome
+from compas_kagome.weaving import weaving_violations_numpy
+
+
+@pytest.mark.parametrize('k', [1, 2, 3])
+def test_polyedge_weaving_numpy(coarse_mesh, k):
+	kagome = Kagome.from_mesh(coarse_mesh, k)
+	weaving = kagome.polyedge_weaving()
+	weave, offsets = kagome.polyedge_weaving_numpy()
+	assert weave.dtype == np.int8
+	weave = weave.tolist()
+	assert [weave[i: j] for i, j in zip(offsets[:-1], offsets[1:])] == weaving
+	compact = kagome.to_compact()
+	compact.store_polyedge_data()
+	assert compact.polyedge_weaving() == weaving
+
+
+@pytest.mark.parametrize('k', [1, 2, 3])
+def test_weaving_violations(coarse_mesh, k):
+	compact = Kagome.from_mesh(coarse_mesh, k).to_compact()
+	compact.store_polyedge_data()
+	crossings, conflicts = compact.polyedge_weaving_violations()
+	assert crossings == []
+
+	# flipping one offset at a crossing is reported
+	offsets, vertices = compact.polyedge_arrays()
+	weave = compact.polyedge_weave_array().copy()
+	counts = np.bincount(vertices)
+	i = int(np.flatnonzero(counts[vertices] == 2)[0])
+	weave[i] *= -1
+	crossings, conflicts = weaving_violations_numpy(compact.face_offsets, compact.face_indices, offsets, vertices, weave, compact.number_of_vertices())
+	assert vertices[i] in crossings.tolist()